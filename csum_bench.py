@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+#       csum_bench.py
+#       
+#       Prints the throughput of the checksums of dizzy.py in MB/s. Part of
+#       dizzy, distributed under the same terms as dizzy.py.
+
+import os
+import struct
+import sys
+import time
+
+from dizzy import dizz
+
+SIZES = [64, 512, 1500, 9000, 65536]
+
+def csum_inet_loop(data, csum=0):
+    #the per byte loop csum_inet used to be, for comparison
+    for i in range(0,len(data),2):
+        if i + 1 >= len(data):
+            csum += data[i] & 0xFF
+        else:
+            w = ((data[i] << 8) & 0xFF00) + (data[i+1] & 0xFF)
+            csum += w
+    while (csum >> 16) > 0:
+        csum = (csum & 0xFFFF) + (csum >> 16)
+    csum = ~csum
+    return struct.pack("!H", csum & 0xFFFF)
+
+def bench(call, data, seconds):
+    #the crcs set up their tables on the first call
+    call(data)
+    count = 0
+    start = time.time()
+    end = start + seconds
+    now = start
+    while now < end:
+        for i in range(10):
+            call(data)
+        count += 10
+        now = time.time()
+    return count * len(data) / (now - start) / 1000000
+
+if __name__ == '__main__':
+    seconds = 0.2
+    if len(sys.argv) > 1:
+        seconds = float(sys.argv[1])
+    algos = [ ("inet (loop)", csum_inet_loop) ]
+    for i in sorted(dizz.CHECKSUM):
+        if i != "none":
+            algos += [ (i, dizz.CHECKSUM[i]["call"]) ]
+    data = { i : os.urandom(i) for i in SIZES }
+    #the pseudo header variants expect an ip header in front
+    data4 = { i : b"\x45" + data[i][1:] for i in SIZES }
+    print("MB/s %14s" % "" + "".join([ "%10d" % i for i in SIZES ]))
+    for (name, call) in algos:
+        if name.endswith("4"):
+            inp = data4
+        else:
+            inp = data
+        print("%-19s" % name + "".join([ "%10.1f" % bench(call, inp[i], seconds) for i in SIZES ]))
@@ -31,25 +31,37 @@
 #       (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 #       OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import ast
 import binascii
-import copy
+import builtins
 import ctypes
+import dis
+import errno
 import fcntl
+import hashlib
+import heapq
 import io
+import itertools
+import marshal
 import math
+import operator
 from optparse import OptionParser
 import os
+import pickle
 import platform
 import pprint
 import random
 import select
 import ssl
 import socket
+import stat
 import struct
 import subprocess
 import sys
 import time
 import traceback
+import types
+import zlib
 
 import tools
 
@@ -62,6 +74,20 @@ PLATFORM = platform.system()
 DEBUG = False
 DEBUG2 = False
 DEBUG3 = False
+COMPILE = False
+SELFTEST = False
+CACHE = False
+#where the loaded models are cached, None for $XDG_CACHE_HOME/dizzy
+CACHE_DIR = None
+#list libraries of this size or bigger are read from the file when used
+LIST_MMAP = 1 << 20
+#fields * values^t above which --cover warns about the time it takes
+COVER_WORK = 1 << 15
+#test cases between two progress reports of a --worker, the range of a
+#worker going away is handed out again from its last report
+WORKER_PROGRESS = 1000
+#set in the processes of a worker, see print_progress()
+PROGRESS_BLOCK = None
 
 RANDOM_SEED="1l0v3D1zzYc4us31tsR4nd0m1sr3Pr0duc4bl3!"
 random.seed(RANDOM_SEED)
@@ -90,6 +116,32 @@ class sctp_sndrcvinfo(ctypes.Structure):
                 ("sinfo_cumtsn", ctypes.c_uint32),
                 ("sinfo_assoc_id", ctypes.c_int)]
 
+#for sendmmsg(2)
+class iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p),
+                ("iov_len", ctypes.c_size_t)]
+
+class msghdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p),
+                ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(iovec)),
+                ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p),
+                ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", msghdr),
+                ("msg_len", ctypes.c_uint)]
+
+try:
+    libc = ctypes.CDLL(None, use_errno=True)
+    sendmmsg = libc.sendmmsg
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(mmsghdr), ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+except (OSError, AttributeError):
+    sendmmsg = None
+
 try:
     import usb
     usb_present = True
@@ -97,6 +149,12 @@ except Exception as e:
     print(e)
     usb_present = False
     print("No GoodFETMAXUSB libs found. USB support disabled!")
+
+try:
+    import numpy
+    numpy_present = True
+except ImportError:
+    numpy_present = False
         
 class dizz_sessionException(Exception):
     pass
@@ -109,12 +167,28 @@ class dizz_session(object):
     SCTP_SNDRCV = 0x1
     SOL_SCTP = 0x84
     SCTP_DEFAULT_SEND_PARAM = 0xa
+    SOL_UDP = 17
+    UDP_SEGMENT = 103
+    IP_MTU = 14
+    IPV6_MTU = 24
+    #UIO_MAXIOV, most messages per sendmmsg
+    MMSG_VLEN = 1024
+    #most segments of one udp gso message
+    GSO_SEGMENTS = 64
 
     def __init__(self, session_type, interface=None, dest=None,
                 dport=None, src='', sport=None, timeout=1, recv_buffer=4096,
                 filename=None, cmd=None, auto_reopen=True, client_cert=None,
-                client_key=None, server_side=False, connect_retry=3):
+                client_key=None, server_side=False, connect_retry=3,
+                mmsg=False):
         self.session_type = session_type
+        self.mmsg = mmsg
+        self.connected = False
+        self.gso = False
+        self.pending = []
+        self.packets = 0
+        self.syscalls = 0
+        self.begin = None
         self.timeout = timeout
         self.recv_buffer = recv_buffer
         self.is_open = False
@@ -204,6 +278,8 @@ class dizz_session(object):
                 self.ifr.ifr_flags |= self.IFF_PROMISC
                 fcntl.ioctl(self.s.fileno(), self.SIOCSIFFLAGS, self.ifr) # S for Set
                 self.maxsize = 1500
+                if self.mmsg:
+                    self.open_mmsg()
             elif self.session_type == "file":
                 filename = "%s-%i" % (self.filename, self.filecount)
                 self.f = open(filename, 'w')
@@ -234,6 +310,11 @@ class dizz_session(object):
                     self.s.setsockopt(self.SOL_SCTP, self.SCTP_DEFAULT_SEND_PARAM, self.sndrcvinfo)
                 if self.sport:
                     self.s.bind((self.src, self.sport))
+                if self.mmsg and self.session_type == "udp" and not self.server_side and self.dport:
+                    #no route lookup per packet
+                    self.s.connect((self.dest, self.dport))
+                    self.connected = True
+                    self.open_mmsg()
                 if self.session_type == "tls":
                     self.s = ssl.SSLSocket(self.s, self.client_key, self.client_cert, ssl_version=3)
                 if self.session_type == "tcp" or self.session_type == "tls":
@@ -272,8 +353,38 @@ class dizz_session(object):
             raise dizz_sessionException("cant open session: %s" % str(e))
         else:
             self.is_open = True
-    
+
+    def open_mmsg(self):
+        #sets up the headers for sendmmsg and looks whether the kernel does
+        #udp gso on the connected socket
+        if sendmmsg is None:
+            return
+        self.msgs = (mmsghdr * self.MMSG_VLEN)()
+        self.iovs = (iovec * self.MMSG_VLEN)()
+        for i in range(self.MMSG_VLEN):
+            self.msgs[i].msg_hdr.msg_iov = ctypes.pointer(self.iovs[i])
+            self.msgs[i].msg_hdr.msg_iovlen = 1
+        self.gso = False
+        if self.connected:
+            try:
+                self.s.setsockopt(self.SOL_UDP, self.UDP_SEGMENT, 0)
+                if self.af == socket.AF_INET:
+                    self.gso_max = self.s.getsockopt(socket.IPPROTO_IP, self.IP_MTU) - 28
+                else:
+                    self.gso_max = self.s.getsockopt(socket.IPPROTO_IPV6, self.IPV6_MTU) - 48
+                self.gso = True
+            except OSError:
+                if DEBUG:
+                    print("no udp gso, sending packets one by one with sendmmsg")
+
     def close(self):
+        if self.pending:
+            (pending, self.pending) = (self.pending, [])
+            try:
+                self.send_mmsg(pending)
+            except Exception as e:
+                if DEBUG:
+                    print("cant send queued packets '%s'" % str(e))
         if self.session_type == "eth":            
             self.ifr.ifr_flags &= ~self.IFF_PROMISC
             fcntl.ioctl(self.s.fileno(), self.SIOCSIFFLAGS, self.ifr)
@@ -293,9 +404,15 @@ class dizz_session(object):
             if self.cs:
                 self.cs.close()
                 self.cs = None
+        self.connected = False
         self.is_open = False
 
     def send(self, data):
+        if self.pending:
+            self.flush()
+        if self.begin is None:
+            self.begin = time.time()
+        self.syscalls += 1
         try:
             if not self.maxsize is None and len(data) > self.maxsize:
                 data = data[:self.maxsize-1]
@@ -334,8 +451,11 @@ class dizz_session(object):
                     self.s.send(data)
             #~ elif self.session_type == "sctp":
                 #~ self.s.sendmsg([data], [(socket.IPPROTO_SCTP, self.SCTP_SNDRCV, self.sndrcvinfo)], 0, (self.dest, self.dport))
+            elif self.connected:
+                self.s.send(data)
             else:
                 self.s.sendto(data, (self.dest, self.dport))
+            self.packets += 1
         except Exception as e:
             if self.auto_reopen:
                 if DEBUG:
@@ -347,6 +467,165 @@ class dizz_session(object):
                 self.close()
                 raise dizz_sessionException("error on sending '%s', connection closed." % str(e))
     
+    def send_batch(self, packets, lengths, rows):
+        #send the first 'rows' packets of a dizz.generate_batch() result
+        if self.session_type != "udp" and self.session_type != "eth":
+            for i in range(rows):
+                self.send(packets[i, :lengths[i]].tobytes())
+            return
+        view = memoryview(packets).cast("B")
+        width = packets.shape[1]
+        self.send_many([ view[i * width:i * width + int(lengths[i])] for i in range(rows) ])
+
+    def send_many(self, packets):
+        #send buffers (bytes or memoryviews) one after the other. udp and
+        #eth send them without copying, or with sendmmsg if the session
+        #was made with mmsg.
+        if self.session_type != "udp" and self.session_type != "eth":
+            for data in packets:
+                self.send(bytes(data))
+            return
+        if self.pending:
+            self.flush()
+        if self.begin is None:
+            self.begin = time.time()
+        if self.mmsg and not sendmmsg is None and (self.connected or self.session_type == "eth"):
+            try:
+                self.send_mmsg(packets)
+            except Exception as e:
+                if self.auto_reopen:
+                    if DEBUG:
+                        print("session got closed '%s', autoreopening..." % str(e))
+                        traceback.print_exc()
+                    self.close()
+                    self.open()
+                else:
+                    self.close()
+                    raise dizz_sessionException("error on sending '%s', connection closed." % str(e))
+            return
+        addr = (self.dest, self.dport)
+        for data in packets:
+            if not self.maxsize is None and len(data) > self.maxsize:
+                data = data[:self.maxsize - 1]
+            self.syscalls += 1
+            try:
+                if self.session_type == "eth" or self.connected:
+                    self.s.send(data)
+                else:
+                    self.s.sendto(data, addr)
+                self.packets += 1
+            except Exception as e:
+                if self.auto_reopen:
+                    if DEBUG:
+                        print("session got closed '%s', autoreopening..." % str(e))
+                        traceback.print_exc()
+                    self.close()
+                    self.open()
+                else:
+                    self.close()
+                    raise dizz_sessionException("error on sending '%s', connection closed." % str(e))
+
+    def send_mmsg(self, packets):
+        #all packets are copied into one buffer once. runs of packets of
+        #the same length fitting into the path mtu go out as one udp gso
+        #message, up to MMSG_VLEN messages per sendmmsg. a message the
+        #kernel refuses is skipped and the rest are still sent, the error
+        #is raised afterwards unless the session auto reopens.
+        if not self.maxsize is None:
+            packets = [ data[:self.maxsize - 1] if len(data) > self.maxsize else data for data in packets ]
+        lengths = [ len(data) for data in packets ]
+        buf = b"".join(packets)
+        base = ctypes.cast(ctypes.c_char_p(buf), ctypes.c_void_p).value
+        space = socket.CMSG_SPACE(2)
+        #(offset, length, segment size, packets, control offset)
+        entries = []
+        controls = []
+        (offset, i, n) = (0, 0, len(lengths))
+        while i < n:
+            size = lengths[i]
+            j = i + 1
+            if self.gso and 0 < size <= self.gso_max:
+                stop = min(n, i + self.GSO_SEGMENTS, i + 65000 // size)
+                while j < stop and lengths[j] == size:
+                    j += 1
+            if j - i > 1:
+                entries.append((offset, size * (j - i), size, j - i, len(controls) * space))
+                controls.append((struct.pack("@Nii", socket.CMSG_LEN(2), self.SOL_UDP, self.UDP_SEGMENT) + struct.pack("@H", size)).ljust(space, b"\x00"))
+            else:
+                entries.append((offset, size, 0, 1, 0))
+            offset += size * (j - i)
+            i = j
+        control = b"".join(controls)
+        cbase = ctypes.cast(ctypes.c_char_p(control), ctypes.c_void_p).value
+        fd = self.s.fileno()
+        done = 0
+        failed = None
+        while done < len(entries):
+            count = min(len(entries) - done, self.MMSG_VLEN)
+            for k in range(count):
+                (offset, length, segment, _, coffset) = entries[done + k]
+                self.iovs[k].iov_base = base + offset
+                self.iovs[k].iov_len = length
+                hdr = self.msgs[k].msg_hdr
+                if segment:
+                    hdr.msg_control = cbase + coffset
+                    hdr.msg_controllen = space
+                else:
+                    hdr.msg_control = None
+                    hdr.msg_controllen = 0
+            sent = sendmmsg(fd, self.msgs, count, 0)
+            self.syscalls += 1
+            if sent < 0:
+                err = ctypes.get_errno()
+                if err == errno.EAGAIN or err == errno.EWOULDBLOCK:
+                    #the socket has a timeout, so its non blocking
+                    (r, w, x) = select.select([], [self.s], [], self.timeout)
+                    if not w:
+                        raise socket.timeout("timed out")
+                    continue
+                if err == errno.ECONNREFUSED:
+                    #icmp error of an earlier packet on the connected socket
+                    continue
+                if entries[done][2] and err in (errno.EINVAL, errno.EIO, errno.ENOPROTOOPT, errno.EOPNOTSUPP):
+                    if DEBUG:
+                        print("udp gso failed '%s', sending packets one by one with sendmmsg" % os.strerror(err))
+                    self.gso = False
+                    self.send_mmsg(packets[sum([ e[3] for e in entries[:done] ]):])
+                    break
+                #sendmmsg only fails if its first message does
+                if DEBUG:
+                    print("dropping %d packet(s), %d byte: '%s'" % (entries[done][3], entries[done][1], os.strerror(err)))
+                if failed is None:
+                    failed = OSError(err, os.strerror(err))
+                done += 1
+                continue
+            self.packets += sum([ e[3] for e in entries[done:done + sent] ])
+            done += sent
+        if not failed is None and not self.auto_reopen:
+            raise failed
+
+    def queue(self, data):
+        #udp and eth sessions made with mmsg send data with the next
+        #flush(), which is done for MMSG_VLEN queued packets. the others
+        #send it right away.
+        if not self.mmsg or sendmmsg is None or not (self.connected or self.session_type == "eth"):
+            self.send(data)
+            return
+        self.pending.append(data)
+        if len(self.pending) >= self.MMSG_VLEN:
+            self.flush()
+
+    def flush(self):
+        (pending, self.pending) = (self.pending, [])
+        if pending:
+            self.send_many(pending)
+
+    def get_stats(self):
+        #(packets, syscalls, seconds) since the first send
+        if self.begin is None:
+            return (self.packets, self.syscalls, 0.0)
+        return (self.packets, self.syscalls, time.time() - self.begin)
+
     def recv(self):
         if self.session_type == "eth":
             return self.s.recv(2048)
@@ -373,26 +652,78 @@ class dizz_session(object):
 class dizz_library(object):
     def __init__(self):
         self.lib = {}
+        self.entries = {}
         self.load_strings("lib/std_string_lib.txt")
 
-    def get_next(self, obj):
-        libidx = obj["length"]
-        if libidx is None:
-            if not obj["encoding"] is None:
-                cur = obj["cur"].decode(obj["encoding"])
-            else:
-                cur = obj["cur"].decode(CODEC)
-        else:
-            cur = obj["cur"]
-        if obj["_type"] == "list":
-            libidx = obj["listname"]
+    def _get_entries(self, obj):
+        #returns the library entries ready to be used as obj.cur and a
+        #value -> position index, so walking a library is O(1) per step
+        libidx = obj.length
+        if obj._type == "list":
+            libidx = obj.listname
         if not libidx in self.lib:
             self.gen_entries(libidx)
-        if cur not in self.lib[libidx]:
-            if libidx == None:
-                return self.lib[libidx][0]
+        if obj.length is None:
+            encoding = obj.encoding
+            if encoding is None:
+                encoding = CODEC
+            key = (libidx, encoding)
+        else:
+            key = libidx
+        if not key in self.entries and isinstance(self.lib[libidx], tools.listfile):
+            entries = self.lib[libidx].entries(encoding)
+            self.entries[key] = (entries, entries)
+        if not key in self.entries:
+            entries = []
+            for i in self.lib[libidx]:
+                if isinstance(i, str) and obj.length is None:
+                    entries += [i.encode(encoding)]
+                else:
+                    entries += [i]
+            pos = {}
+            for i in range(len(entries) - 1):
+                if not entries[i] in pos:
+                    pos[entries[i]] = i
+            if obj.length is None and self.lib[libidx][0] == "":
+                pos.setdefault(b"", 0)
+            self.entries[key] = (entries, pos)
+        return self.entries[key]
+
+    def get_next(self, obj):
+        #the position of the value handed out last is kept in the field
+        #(counter and counted, like for "full" fields), so big lists are
+        #not looked up by value while they are walked
+        (entries, pos) = self._get_entries(obj)
+        if getattr(obj, "counted", None) is obj.cur:
+            cur = obj.counter
+        elif obj.cur == b"":
+            #the nulled field, every string list starts with ""
+            cur = 0
+        else:
+            cur = pos.get(obj.cur)
+        if cur is None:
+            if obj.length is None and obj._type != "list":
+                return entries[0]
             return None
-        return self.lib[libidx][self.lib[libidx].index(cur) + 1]
+        value = entries[cur + 1]
+        if not value is None:
+            obj.counter = cur + 1
+            obj.counted = value
+        return value
+
+    def get_count(self, obj):
+        #number of values get_next() walks through, starting at the nulled field
+        (entries, pos) = self._get_entries(obj)
+        if obj.length is None:
+            null = b""
+        else:
+            null = bytes(obj.bytelen)
+        if pos.get(null) != 0:
+            return 1
+        return len(entries) - 1
+
+    def get_value(self, obj, pos):
+        return self._get_entries(obj)[0][pos]
 
     def gen_entries(self, length):
         bytelen = length // 8
@@ -433,15 +764,27 @@ class dizz_library(object):
     def load_strings(self, filename, listname=None, ascii=True):
         if listname in self.lib:
             return
-        self.lib[listname] = [ "", None ]
-        with open(filename, 'r') as f:
+        if os.path.getsize(filename) >= LIST_MMAP:
+            self.lib[listname] = tools.listfile(filename, ascii)
+            return
+        #lines end at \n, a \r in front of it is dropped like by listfile
+        lib = [ "" if ascii else b"" ]
+        seen = set(lib)
+        with open(filename, 'rb') as f:
             for l in f:
-                if l.rstrip('\n') in self.lib[listname]:
-                    pass
+                l = l.rstrip(b'\n')
+                if l.endswith(b'\r'):
+                    l = l[:-1]
                 if ascii:
-                    self.lib[listname].insert(-1, l.rstrip('\n'))
+                    l = l.decode(CODEC)
                 else:
-                    self.lib[listname].insert(-1, bytes(l.rstrip('\n'), CODEC).decode("unicode_escape").encode(CODEC))
+                    l = l.decode("unicode_escape").encode(CODEC)
+                if l in seen:
+                    continue
+                seen.add(l)
+                lib.append(l)
+        lib.append(None)
+        self.lib[listname] = lib
     
 class dizz_parseException(Exception):
     pass
@@ -449,6 +792,55 @@ class dizz_parseException(Exception):
 class dizz_runtimeException(Exception):
     pass
 
+class dizz_field(object):
+    #a field of a dizz. the attributes are slots instead of a dict per
+    #field, so the fuzzing loop uses less memory and faster lookups. they
+    #can still be used as keys like on a dict, e.g. by save() or by code
+    #in dizz and act files.
+    __slots__ = (   "_type", "_name", "length", "default", "fuzz", "endian", "encoding", "bytelen", "cur",
+                    "listname", "source", "fillto", "fillwith", "start", "end", "modulo", "orglen", "fill", "maxlen",
+                    "counter", "counted"
+                    )
+
+    def __init__(self, values={}):
+        for (key, value) in values.items():
+            setattr(self, key, value)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    def get(self, key, default=None):
+        if not key in self:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return [ i for i in self.__slots__ if hasattr(self, i) ]
+
+    def items(self):
+        return [ (i, getattr(self, i)) for i in self.keys() ]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
 class dizz(object):
     def __init__(self, library=None):
         self.objects = []
@@ -457,18 +849,39 @@ class dizz(object):
         self.cur_obj = None
         self.last_obj = None
         self.null_obj = False
+        self.fixed_objs = ()
+        self._seek_from = None
         if not library:
             library = dizz_library()
         self.library = library
         self.filename = None
+        self.lists = []
+        self.compiled = COMPILE
+        self._segments = None
+        self._schedule = None
+        self._changed = set()
+        self._changed_all = True
+        self._pending = set()
         
     def update_obj_dict(self):
         self.obj_dict = {}
         for i in self.objects:
-            self.obj_dict[i["_name"]] = i
+            self.obj_dict[i._name] = i
 
     def load(self, filename):
         self.filename = filename
+        model = read_cache(filename)
+        if not model is None:
+            #the lists are not part of the cache
+            for (listname, ascii) in model["lists"]:
+                self.library.load_strings(listname, listname, ascii=ascii)
+            self.name = model["name"]
+            self.objects = [ dizz_field(i) for i in model["objects"] ]
+            self.functions = model["functions"]
+            self.update_obj_dict()
+            self._get_schedule()
+            return
+        self.lists = []
         ns = {  "field"         :   self.basic_dizz,
                 "list"          :   self.list_dizz,
                 "rand"          :   self.rand_dizz,
@@ -496,7 +909,13 @@ class dizz(object):
         self.name = ns["name"]
         self.objects = ns["objects"]
         self.functions = ns["functions"]
+        write_cache(filename, { "name"      :   self.name,
+                                "objects"   :   [ dict(i.items()) for i in self.objects ],
+                                "functions" :   self.functions,
+                                "lists"     :   self.lists
+                                })
         self.update_obj_dict()
+        self._get_schedule()
 
     def save(self, filename):
         pp = pprint.PrettyPrinter(indent=4)
@@ -542,45 +961,329 @@ class dizz(object):
                 tmpobj += [ n ]
             f.write("functions = %s\n" % pp.pformat(tmpobj))
 
-    def _alignmod(self, obj, mod):
-        _DEBUG = DEBUG3
-        out = b""
-        if _DEBUG: print("cur: %s" % binascii.hexlify(obj["cur"]))
-        out += bytes([(obj["cur"][0] << 8 - mod) & 0xff])
-        if _DEBUG: print("out: %s" % binascii.hexlify(out))
-        for j in range(1, obj["bytelen"]):
-            #~ if DEBUG:
-                #~ print("out %s       obj[\"cur\"] %s" % (type(out), type(obj["cur"])))
-                #~ print("out[-1:] %s %s" % (type(out[-1:]), out[-1:]))
-                #~ print("obj[\"cur\"][j] %s %s" % (type(obj["cur"][j]), obj["cur"][j]))
-                #~ print("out[-1:] %s       out[-1] %s" % (out[-1:], out[-1]))
-            if _DEBUG: print("j: %d" % j)
-            tmp = out[-1] | (obj["cur"][j] >> mod) 
-            if _DEBUG: print("tmp: %x" % tmp)
-            out = out[:-1] + bytes([tmp])
-            if _DEBUG: print("out: %s" % binascii.hexlify(out))
-            tmp2 = (obj["cur"][j] << 8 - mod) & 0xff
-            if _DEBUG: print("tmp2: %x" % tmp2)
-            out += bytes([tmp2])
-            if _DEBUG: print("out: %s" % binascii.hexlify(out))
-        return out
-
     def generate(self, offset=0, leading_data=b"\x00"):
         if len(self.objects) == 0:
             return b""
-        return self._get_obj_data(0, len(self.objects) - 1, offset, leading_data)
+        if offset != 0:
+            return self._get_obj_data(0, len(self.objects) - 1, offset, leading_data)
+        return self._render()
+
+    def _render(self):
+        #the packet is kept in a buffer, split into segments of fields that
+        #start at a byte boundary. only segments containing a field that
+        #changed since the last call get rendered again.
+        objects = self.objects
+        seg = self._segments
+        if seg is None or seg["objects"] is not objects or len(objects) != len(seg["lengths"]) or self._segments_moved():
+            seg = self._segments = self._split_segments()
+            seg["curs"] = None
+            seg["builder"] = None
+        if self.compiled:
+            if seg["builder"] is None:
+                seg["builder"] = self._get_builder(seg)
+            out = seg["builder"](objects)
+            if SELFTEST:
+                check = self._get_obj_data(0, len(objects) - 1)
+                if out != check:
+                    raise dizz_runtimeException("compiled builder of '%s' differs from interpreter: %s != %s" % (self.filename, binascii.hexlify(out), binascii.hexlify(check)))
+            return out
+        if len(seg["ranges"]) < 8 and len(seg["ranges"]) == len(objects):
+            #few byte aligned fields, bookkeeping would cost more than it saves
+            return self._get_obj_data(0, len(objects) - 1)
+        curs = [ i.cur for i in objects ]
+        if seg["curs"] is None:
+            seg["pos"] = []
+            seg["len"] = []
+            self._buffer = bytearray()
+            for (start, end) in seg["ranges"]:
+                data = self._get_obj_data(start, end)
+                seg["pos"] += [len(self._buffer)]
+                seg["len"] += [len(data)]
+                self._buffer += data
+        else:
+            dirty = set()
+            for i in itertools.compress(range(len(curs)), map(operator.ne, curs, seg["curs"])):
+                dirty.add(seg["index"][i])
+            for i in sorted(dirty):
+                (start, end) = seg["ranges"][i]
+                data = self._get_obj_data(start, end)
+                pos = seg["pos"][i]
+                self._buffer[pos:pos + seg["len"][i]] = data
+                if len(data) != seg["len"][i]:
+                    shift = len(data) - seg["len"][i]
+                    seg["len"][i] = len(data)
+                    for j in range(i + 1, len(seg["pos"])):
+                        seg["pos"][j] += shift
+        seg["curs"] = curs
+        return bytes(self._buffer)
+
+    #generated packet builders, keyed by file and field lengths
+    BUILDERS = {}
+
+    def _get_builder(self, seg):
+        key = (self.filename, tuple(seg["lengths"]))
+        if key in dizz.BUILDERS:
+            return dizz.BUILDERS[key]
+        src = self._builder_source(seg)
+        if DEBUG:
+            print(src)
+        ns = { "bitwriter" : tools.bitwriter }
+        exec(compile(src, "<builder %s>" % self.filename, "exec"), ns)
+        if self.filename is not None:
+            dizz.BUILDERS[key] = ns["build"]
+        return ns["build"]
+
+    def _builder_source(self, seg):
+        #emits the steps _get_obj_data() would take for the current field
+        #lengths. aligned fields are joined as they are, runs of sub byte
+        #fields are shifted into one int, runs containing variable length
+        #fields go through the bitwriter.
+        lengths = seg["lengths"]
+        lines = [ "def build(o):" ]
+        parts = []
+        for (start, end) in seg["ranges"]:
+            if start == end and (lengths[start] is None or lengths[start] % 8 == 0):
+                parts += [ "o[%d].cur" % start ]
+            elif None in lengths[start:end + 1]:
+                lines += [ "    w = bitwriter()" ]
+                for i in range(start, end + 1):
+                    if lengths[i] is None:
+                        lines += [ "    w.write(o[%d].cur, len(o[%d].cur) * 8, len(o[%d].cur))" % (i, i, i) ]
+                    else:
+                        lines += [ "    w.write(o[%d].cur, %d, %d)" % (i, lengths[i], self.objects[i].bytelen) ]
+                lines += [ "    p%d = w.getvalue()" % start ]
+                parts += [ "p%d" % start ]
+            else:
+                terms = []
+                offset = 0
+                size = 0
+                for i in range(start, end + 1):
+                    length = lengths[i]
+                    bytelen = self.objects[i].bytelen
+                    modulo = length % 8
+                    if bytelen == 0:
+                        continue
+                    value = "int.from_bytes(o[%d].cur[:%d], \"big\")" % (i, bytelen)
+                    if modulo != 0:
+                        value = "(%s << %d & 0x%x)" % (value, 8 - modulo, (1 << bytelen * 8) - 1)
+                    if offset == 0:
+                        terms += [ [value, bytelen] ]
+                        size += bytelen
+                        offset = 8 - modulo
+                        continue
+                    if modulo < offset:
+                        terms += [ ["%s << %d" % (value, offset), bytelen] ]
+                        size += bytelen
+                    else:
+                        terms += [ ["%s >> %d" % (value, 8 - offset), bytelen - 1] ]
+                        size += bytelen - 1
+                    offset = abs(offset - modulo)
+                shift = size * 8
+                expr = []
+                for (value, grow) in terms:
+                    shift -= grow * 8
+                    if shift:
+                        expr += [ "(%s) << %d" % (value, shift) ]
+                    else:
+                        expr += [ value ]
+                parts += [ "(%s).to_bytes(%d, \"big\")" % (" | ".join(expr), size) ]
+        lines += [ "    return b\"\".join((%s,))" % ", ".join(parts) ]
+        return "\n".join(lines) + "\n"
+
+    def _segments_moved(self):
+        #only padding and grow fields change their length
+        for i in self._segments["resize"]:
+            if self.objects[i].length != self._segments["lengths"][i]:
+                return True
+        return False
+
+    def _split_segments(self):
+        #follows the bit offset the same way _get_obj_data() does
+        lengths = [ i.length for i in self.objects ]
+        seg = { "objects"   :   self.objects,
+                "lengths"   :   lengths,
+                "resize"    :   [ i for i in range(len(lengths)) if self.objects[i]._type in ("padding", "grow") ],
+                "index"     :   [],
+                "ranges"    :   []
+                }
+        offset = 0
+        for i in range(len(lengths)):
+            if offset == 0:
+                seg["ranges"] += [[i, i]]
+            seg["ranges"][-1][1] = i
+            seg["index"] += [len(seg["ranges"]) - 1]
+            if lengths[i] is None:
+                modulo = 0
+            else:
+                modulo = lengths[i] % 8
+            if offset != 0:
+                offset = abs(offset - modulo)
+            elif modulo != 0:
+                offset = 8 - modulo
+        return seg
+
+    def generate_batch(self, count, recurse):
+        #render up to 'count' consecutive mutations into one numpy array,
+        #one packet per row. walks the dizz like the main loop does
+        #(operate(), generate(), mutate()) and returns
+        #(packets, lengths, rows, more)
+        if not numpy_present:
+            raise dizz_runtimeException("numpy is needed for batch generation")
+        packets = numpy.zeros((count, 0), dtype=numpy.uint8)
+        lengths = numpy.zeros(count, dtype=numpy.intp)
+        rows = 0
+        more = True
+        while more and rows < count:
+            block = self._get_batch_run(count - rows)
+            if block is None:
+                self.operate()
+                block = numpy.frombuffer(self.generate(), dtype=numpy.uint8).reshape((1, -1))
+            if block.shape[1] > packets.shape[1]:
+                tmp = numpy.zeros((count, block.shape[1]), dtype=numpy.uint8)
+                tmp[:, :packets.shape[1]] = packets
+                packets = tmp
+            packets[rows:rows + block.shape[0], :block.shape[1]] = block
+            lengths[rows:rows + block.shape[0]] = block.shape[1]
+            rows += block.shape[0]
+            more = self.mutate(recurse)
+        return (packets, lengths, rows, more)
+
+    def _get_batch_run(self, limit):
+        #if the next packets only differ in the current "full" field
+        #counting up, render them at once: the packet is assembled with
+        #this field (and the fields depending on it) zeroed, and the bits
+        #of the values are or'ed into the columns they end up in.
+        if self.cur_obj is None or limit < 2:
+            return None
+        if self.null_obj and self.null_obj != self.cur_obj:
+            return None
+        obj = self.objects[self.cur_obj]
+        if obj.fuzz != "full" or obj.length > 32 or len(obj.cur) != obj.bytelen:
+            return None
+        for i in self.objects:
+            if i._type == "rand" or i._type == "grow":
+                return None
+        sources = [ self.cur_obj ]
+        for i in range(len(self.objects)):
+            if self.objects[i]._type == "link" and self.objects[i].source == obj._name:
+                sources += [i]
+        functions = []
+        for step in self._get_schedule()["steps"]:
+            i = step["func"]
+            if i["func"] == "length":
+                continue
+            if i["func"] != "csum" or "lambda_in" in i or "lambda_out" in i:
+                return None
+            if step["dest"] != self.cur_obj:
+                functions += [(i, step["dest"], step["start"], step["end"])]
+        csums = []
+        for (i, dest, start, end) in functions:
+            for j in sources:
+                if j >= start and j <= end:
+                    if dest in sources or self.objects[dest].length is None:
+                        return None
+                    csums += [(i, dest, start, end)]
+                    break
+        #checksums over other changing checksums are not supported
+        for (i, dest, start, end) in csums:
+            for (j, dest2, start2, end2) in functions:
+                if dest != dest2 and dest >= start2 and dest <= end2:
+                    return None
+        first = int.from_bytes(obj.cur, "big")
+        num = min((1 << obj.length) - first, limit)
+        if num < 2:
+            return None
+        values = numpy.arange(first, first + num, dtype=numpy.uint64)
+        cur = obj.cur
+        block = None
+        outputs = []
+        try:
+            obj.cur = bytes(obj.bytelen)
+            self._touch()
+            self.operate()
+            for (i, dest, start, end) in csums:
+                self.objects[dest].cur = bytes(self.objects[dest].bytelen)
+            base = self.generate()
+            packets = numpy.empty((num, len(base)), dtype=numpy.uint8)
+            packets[:] = numpy.frombuffer(base, dtype=numpy.uint8)
+            if not self._batch_or(packets, values, sources, base, self.generate):
+                return None
+            for (i, dest, start, end) in csums:
+                self.objects[dest].cur = self.objects[dest].default
+                render = lambda: self._get_obj_data(start, end)
+                inbase = render()
+                inp = numpy.empty((num, len(inbase)), dtype=numpy.uint8)
+                inp[:] = numpy.frombuffer(inbase, dtype=numpy.uint8)
+                if not self._batch_or(inp, values, sources, inbase, render):
+                    return None
+                if i["type"] != "custom" and "batch" in self.CHECKSUM[i["type"]]:
+                    output = self.CHECKSUM[i["type"]]["batch"](inp)
+                else:
+                    if i["type"] == "custom":
+                        call = i["callback"]
+                    else:
+                        call = self.CHECKSUM[i["type"]]["call"]
+                    output = numpy.zeros(num, dtype=numpy.uint64)
+                    for j in range(num):
+                        out = call(inp[j].tobytes())
+                        if len(out) != self.objects[dest].bytelen:
+                            return None
+                        output[j] = int.from_bytes(out, "big")
+                self.objects[dest].cur = bytes(self.objects[dest].bytelen)
+                if not self._batch_or(packets, output, [dest], base, self.generate):
+                    return None
+                outputs += [(dest, int(output[-1]))]
+            block = packets
+        finally:
+            self._touch()
+            if block is None:
+                obj.cur = cur
+            else:
+                #leave the fields like the walk does after the last row, a
+                #function not run on the next packet keeps these values
+                obj.counter = first + num - 1
+                obj.cur = obj.counted = obj.counter.to_bytes(obj.bytelen, "big")
+                for j in sources[1:]:
+                    self.objects[j].cur = obj.cur
+                for (dest, value) in outputs:
+                    self.objects[dest].cur = value.to_bytes(self.objects[dest].bytelen, "big")
+        return block
+
+    def _batch_or(self, block, values, indices, base, render):
+        #set single bits of the fields in 'indices' to find out where they
+        #end up in the output of 'render', then or the bits of 'values' in
+        obj = self.objects[indices[0]]
+        zero = bytes(obj.bytelen)
+        for bit in range(obj.length):
+            for i in indices:
+                self.objects[i].cur = (1 << bit).to_bytes(obj.bytelen, "big")
+            out = render()
+            for i in indices:
+                self.objects[i].cur = zero
+            if len(out) != len(base):
+                return False
+            column = None
+            for j in range(len(out)):
+                if out[j] != base[j]:
+                    if column is None:
+                        column = ((values >> numpy.uint64(bit)) & numpy.uint64(1)).astype(numpy.uint8)
+                    block[:, j] |= column * numpy.uint8(out[j] ^ base[j])
+        return True
 
     def _nullobj(self, obj):
-        if obj["fuzz"] == "none":
+        #only called on the current field
+        if obj.fuzz == "none":
             return
-        if obj["bytelen"]:
-            obj["cur"] = bytes([ 0x00 for i in range(obj["bytelen"]) ])
+        self._changed.add(self.cur_obj)
+        if obj.bytelen:
+            obj.cur = bytes([ 0x00 for i in range(obj.bytelen) ])
         else:
-            obj["cur"] = b""
+            obj.cur = b""
 
     def _nextobj(self, reset=True, null=True):
         if reset:
-            self.objects[self.cur_obj]["cur"] = self.objects[self.cur_obj]["default"]
+            self.objects[self.cur_obj].cur = self.objects[self.cur_obj].default
+            self._changed.add(self.cur_obj)
         self.cur_obj += 1
         if self.cur_obj < len(self.objects):
             if null:
@@ -604,13 +1307,13 @@ class dizz(object):
             raise dizz_runtimeException("end marker is not string, nor int, but '%s'!" % type(end))
         length = 0
         for i in range(start_index, end_index + 1):
-            if not self.objects[i]["length"] is None:
-                length += self.objects[i]["length"]
+            if not self.objects[i].length is None:
+                length += self.objects[i].length
             else:
-                length += len(self.objects[i]["cur"]) * 8
+                length += len(self.objects[i].cur) * 8
         return length
     
-    def _get_obj_data(self, start, end, offset=0, leading_data=b"\x00"):
+    def _get_obj_data(self, start, end, offset=0, leading_data=b"\x00", positions=None):
         _DEBUG = DEBUG2
         if isinstance(start, int):
             start_index = start
@@ -625,61 +1328,28 @@ class dizz(object):
         else:
             raise dizz_runtimeException("end marker is not string, nor int, but '%s'!" % type(end))
         if offset == 0:
-            out = b""
+            out = tools.bitwriter()
         else:
-            out = leading_data
+            out = tools.bitwriter(leading_data, offset)
         for i in range(start_index, end_index + 1):
             i = self.objects[i]
             if DEBUG:
-                print("name: " + i["_name"])
-                print("cur:  " + str(type(i["cur"])))
-            if _DEBUG: print("offset: %d" % offset) 
-            if i["length"] is None:
-                bytelen = len(i["cur"])
-                length = bytelen * 8
-            else:
-                length = i["length"]
-                bytelen = i["bytelen"]
-            modulo = length % 8
-            if _DEBUG: print("modulo: %d" % modulo)
-            if offset != 0:
-                if modulo != 0:
-                    cur = self._alignmod(i, modulo)
-                else:
-                    cur = i["cur"]
-                if _DEBUG: print("cur: %s" % binascii.hexlify(cur))
-                for j in range(bytelen):
-                    if _DEBUG: print("j: %d" % j)
-                    tmp2 = bytes([out[-1] | (cur[j] >> 8 - offset)])
-                    if _DEBUG: print("tmp2: %s" % tmp2)
-                    out = out[:-1] + tmp2
-                    if _DEBUG: print("out: %s" % out)
-                    tmp = bytes([(cur[j] << offset) & 0xff])
-                    if _DEBUG: print("tmp: %s" % binascii.hexlify(tmp))
-                    if j == bytelen - 1:
-                        if offset - modulo == 0:
-                            if _DEBUG:
-                                print("breaking byte aligned")
-                            break
-                        if modulo - offset > 0:
-                            if _DEBUG:
-                                print("breaking out of obj data")
-                            break
-                    out += tmp
-                offset = abs(offset - modulo)
+                print("name: " + i._name)
+                print("cur:  " + str(type(i.cur)))
+            if _DEBUG: print("offset: %d" % out.offset)
+            if not positions is None and out.offset == 0:
+                positions[i._name] = len(out.out)
+            if i.length is None:
+                out.write(i.cur, len(i.cur) * 8, len(i.cur))
             else:
-                if modulo != 0:
-                    out += self._alignmod(i, modulo)
-                    offset = 8 - modulo
-                else:
-                    out += i["cur"]
+                out.write(i.cur, i.length, i.bytelen)
             if _DEBUG:
-                print(binascii.hexlify(out))
-        return out
+                print(binascii.hexlify(out.out))
+        return out.getvalue()
     
     def _find_first_obj(self):
         self.cur_obj = 0
-        while self.objects[self.cur_obj]["fuzz"] == "none":
+        while self.objects[self.cur_obj].fuzz == "none":
             self.cur_obj += 1
             if self.cur_obj >= len(self.objects):
                 self.cur_obj = None
@@ -687,6 +1357,8 @@ class dizz(object):
         return True
     
     def get_current(self, recurse=False):
+        if self.fixed_objs:
+            return ", ".join([ "%s: %s" % (self.objects[i]._name, self.objects[i].cur[:1024]) for i in sorted(self.fixed_objs) ])
         if self.cur_obj is None:
             return None
         if self.last_obj is None and recurse:
@@ -694,12 +1366,22 @@ class dizz(object):
         obj = self.objects[self.cur_obj]
         if recurse:
             obj2 = self.objects[self.last_obj]
-            return "%s-%s: %s-%s" % (obj["_name"], obj2["_name"], obj["cur"][:1024], obj2["cur"][:1024])
+            return "%s-%s: %s-%s" % (obj._name, obj2._name, obj.cur[:1024], obj2.cur[:1024])
         else:
-            return "%s: %s" % (obj["_name"], obj["cur"][:1024])
+            return "%s: %s" % (obj._name, obj.cur[:1024])
     
     def mutate(self, recurse):
         _DEBUG = DEBUG2
+        #fast path: just count up the current "full" field
+        if not self.cur_obj is None and (not self.null_obj or self.null_obj == self.cur_obj):
+            obj = self.objects[self.cur_obj]
+            if obj.fuzz == "full" and getattr(obj, "counted", None) is obj.cur and obj.counter < (1 << obj.length) - 1:
+                obj.counter += 1
+                obj.cur = obj.counted = obj.counter.to_bytes(obj.bytelen, "big")
+                self._changed.add(self.cur_obj)
+                if recurse:
+                    self.null_obj = self.cur_obj
+                return True
         done = False
         if len(self.objects) == 0:
             return False
@@ -719,7 +1401,7 @@ class dizz(object):
             else:
                 if self.null_obj:
                     while self.cur_obj != self.null_obj:
-                        if self.objects[self.cur_obj]["fuzz"] != "none":
+                        if self.objects[self.cur_obj].fuzz != "none":
                             if _DEBUG:
                                 print("NULLing %i" % self.cur_obj)
                             self._nullobj(self.objects[self.cur_obj])
@@ -727,7 +1409,7 @@ class dizz(object):
                     self._find_first_obj()
                     self.null_obj = False
                 obj = self.objects[self.cur_obj]
-                if obj["fuzz"] == "none":
+                if obj.fuzz == "none":
                     if recurse:
                         if self.cur_obj == self.last_obj or self.last_obj is None:
                             if self._nextobj(False, True):
@@ -737,11 +1419,15 @@ class dizz(object):
                             self._nextobj(False, False)
                     else:
                         self._nextobj()
-                elif obj["fuzz"] == "full":
+                elif obj.fuzz == "full":
+                    #the field value is kept as int, it is only read back
+                    #from "cur" if someone else changed the field
+                    if getattr(obj, "counted", None) is not obj.cur:
+                        obj.counter = int.from_bytes(obj.cur, "big")
                     if _DEBUG:
-                        print("%s: cur: %s, int(cur): %d, max: %d" % (obj["_name"], binascii.hexlify(obj["cur"]), int(binascii.hexlify(obj["cur"]), 16), int(math.pow(2, obj["length"])) - 1))
-                    
-                    if int(binascii.hexlify(obj["cur"]), 16) >= math.pow(2, obj["length"]) - 1:
+                        print("%s: cur: %s, int(cur): %d, max: %d" % (obj._name, binascii.hexlify(obj.cur), obj.counter, (1 << obj.length) - 1))
+
+                    if obj.counter >= (1 << obj.length) - 1:
                         if recurse:
                             if self.cur_obj == self.last_obj or self.last_obj is None:
                                 if self._nextobj(False, True):
@@ -755,14 +1441,16 @@ class dizz(object):
                             self._nextobj()
                             done = True
                     else:
-                        #obj["cur"] = pack_with_length(long(obj["cur"].encode("hex"), 16) + 1, obj["length"], obj["endian"])
-                        obj["cur"] = tools.pack_with_length(int(binascii.hexlify(obj["cur"]), 16) + 1, obj["length"])
+                        #obj.cur = pack_with_length(long(obj.cur.encode("hex"), 16) + 1, obj.length, obj.endian)
+                        obj.counter += 1
+                        obj.cur = obj.counted = obj.counter.to_bytes(obj.bytelen, "big")
+                        self._changed.add(self.cur_obj)
                         if recurse:
                             self.null_obj = self.cur_obj
                         done = True
-                elif obj["fuzz"] == "std":
+                elif obj.fuzz == "std":
                     nextval = self.library.get_next(obj)
-                    if _DEBUG: print("%s: len: %s cur: %s next: %s" % (obj["_name"], obj["length"], obj["cur"], nextval))
+                    if _DEBUG: print("%s: len: %s cur: %s next: %s" % (obj._name, obj.length, obj.cur, nextval))
                     if nextval is None:
                         if recurse:
                             if self.cur_obj == self.last_obj or self.last_obj is None:
@@ -777,19 +1465,15 @@ class dizz(object):
                             self._nextobj()
                             done = True
                     else:
-                        if obj["length"] is None:
-                            if not obj["encoding"] is None:
-                                nextval = nextval.encode(obj["encoding"])
-                            else:
-                                nextval = nextval.encode(CODEC)                        
-                        #if obj["endian"] == "<":
-                        #    next = pack_with_length(next, obj["length"], obj["endian"])
-                        obj["cur"] = nextval
+                        #if obj.endian == "<":
+                        #    next = pack_with_length(next, obj.length, obj.endian)
+                        obj.cur = nextval
+                        self._changed.add(self.cur_obj)
                         if recurse:
                             self.null_obj = self.cur_obj
                         done = True
                 else:
-                    raise dizz_runtimeException("unknown fuzzing type: %s" % obj["fuzz"])
+                    raise dizz_runtimeException("unknown fuzzing type: %s" % obj.fuzz)
         
         if _DEBUG:
             print("cur_obj: %s last_obj: %s null_obj: %s" % (self.cur_obj, self.last_obj, self.null_obj))
@@ -801,106 +1485,635 @@ class dizz(object):
             self._find_first_obj()
         return True
 
-    def operate(self):
-        _DEBUG = DEBUG2
+    def _get_count(self, obj):
+        if obj.fuzz == "full":
+            return 1 << obj.length
+        elif obj.fuzz == "std":
+            return self.library.get_count(obj)
+        else:
+            raise dizz_runtimeException("unknown fuzzing type: %s" % obj.fuzz)
+
+    def _get_value(self, obj, pos):
+        if pos == 0:
+            if obj.bytelen:
+                return bytes(obj.bytelen)
+            return b""
+        if obj.fuzz == "full":
+            return pos.to_bytes(obj.bytelen, "big")
+        return self.library.get_value(obj, pos)
+
+    def _set_value(self, obj, pos):
+        #puts the value at pos into the field and keeps pos, so mutate()
+        #carries on from there without looking the value up. the nulled
+        #field is found by mutate() on its own.
+        obj.cur = self._get_value(obj, pos)
+        if pos > 0:
+            obj.counter = pos
+            obj.counted = obj.cur
+
+    def _get_fuzz_fields(self):
+        fields = []
+        for i in range(len(self.objects)):
+            if self.objects[i].fuzz != "none":
+                fields += [i]
+        counts = [ self._get_count(self.objects[i]) for i in fields ]
+        #none fields behind the last mutable field cost one more round
+        if len(fields) > 0 and fields[-1] < len(self.objects) - 1:
+            counts += [1]
+        return (fields, counts)
+
+    def get_mutation_count(self, recurse):
+        (fields, counts) = self._get_fuzz_fields()
+        if len(fields) == 0:
+            return 0
+        if not recurse:
+            return sum(counts)
+        total = size = counts[0]
+        for i in counts[1:]:
+            size *= i
+            total += size
+        return total
+
+    def get_plan(self):
+        #[(name, mode, values, mutations, recursive mutations), ...] for all
+        #mutable fields, without generating anything
+        (fields, counts) = self._get_fuzz_fields()
+        plan = []
+        size = 1
+        for k in range(len(counts)):
+            size *= counts[k]
+            if k == len(fields):
+                plan += [(self.objects[fields[-1] + 1]._name, "none", 1, 1, size)]
+            elif self.objects[fields[k]]._type == "list":
+                plan += [(self.objects[fields[k]]._name, "list", counts[k], counts[k], size)]
+            else:
+                plan += [(self.objects[fields[k]]._name, self.objects[fields[k]].fuzz, counts[k], counts[k], size)]
+        return plan
+
+    def get_sample(self, count, recurse, seed=0, stratify=False):
+        #yields up to 'count' distinct test case numbers for seek(), drawn
+        #uniformly from all test cases. stratified, the test cases of each
+        #field (the default packet being one of them) are drawn from in
+        #turns, so every field gets the same share until it runs out.
+        key = ("%s %d" % (RANDOM_SEED, seed)).encode(CODEC)
+        total = self.get_mutation_count(recurse) + 1
+        if not stratify:
+            perm = tools.permutation(total, key)
+            for i in range(min(count, total)):
+                yield perm[i]
+            return
+        strata = [ (0, tools.permutation(1, key)) ]
+        offset = 1
+        for (name, mode, values, mutations, rmutations) in self.get_plan():
+            size = rmutations if recurse else mutations
+            strata += [ (offset, tools.permutation(size, key + name.encode(CODEC))) ]
+            offset += size
+        order = tools.permutation(len(strata), key)
+        strata = [ strata[order[k]] for k in range(len(strata)) ]
+        pos = 0
+        while count > 0 and strata:
+            for (offset, perm) in strata:
+                if pos < perm.size and count > 0:
+                    yield offset + perm[pos]
+                    count -= 1
+            strata = [ k for k in strata if k[1].size > pos + 1 ]
+            pos += 1
+
+    def get_cover(self, t=2, limit=32):
+        #test cases in which all combinations of the values of any t
+        #mutable fields show up, see tools.covering_array(). the values of
+        #a field are its default and its mutations, a field with more than
+        #'limit' of them gets 'limit' values spread evenly. returns a list
+        #of [(field, value), ...] for set_values().
+        (fields, counts) = self._get_fuzz_fields()
+        values = []
+        for k in range(len(fields)):
+            obj = self.objects[fields[k]]
+            if counts[k] + 1 <= limit:
+                positions = range(counts[k])
+            else:
+                positions = tools.unique([ j * (counts[k] - 1) // (limit - 2) for j in range(limit - 1) ])
+            values += [ [ None ] + [ self._get_value(obj, j) for j in positions ] ]
+        sizes = sorted([ len(i) for i in values ], reverse=True)
+        if len(sizes) > t and len(sizes) * max(sizes) ** t > COVER_WORK:
+            rows = 1
+            for i in sizes[:t]:
+                rows *= i
+            print("covering %d fields with up to %d values %d-way takes a while, about %d test cases (lower --cover-values to speed it up)" % (len(sizes), sizes[0], t, rows * max(1, math.log(len(sizes)) - 1)), file=sys.stderr)
+        cover = []
+        for row in tools.covering_array([ len(i) for i in values ], t):
+            cover += [ [ (fields[k], values[k][row[k]]) for k in range(len(fields)) if row[k] > 0 ] ]
+        return cover
+
+    def set_values(self, values):
+        #put the given values into the fields and all other mutable fields
+        #to their default. the length, csum and time functions keep off of
+        #these fields.
+        self._seek(0, False)
+        for (index, cur) in values:
+            self.objects[index].cur = cur
+        self.fixed_objs = frozenset([ i for (i, _) in values ])
+
+    def can_jump(self):
+        #fill and grow fields get their value from the packets before, a
+        #dizz with them cant jump to a test case but has to walk to it
+        for i in self.objects:
+            if i._type == "fill" or i._type == "grow":
+                return False
+        return True
+
+    def seek(self, index, recurse):
+        #put the dizz into the state mutate() leaves behind after 'index'
+        #calls, without walking through all the mutations in between.
+        #returns what the last of these mutate() calls would have returned.
+        #operate() doesnt update the length and csum of the current or last
+        #field, they keep the value of an earlier packet. so the last step
+        #is done on the packet before, like the walk does, and a none field
+        #being the last field gets the values of the packet before it
+        #became the last one. if can_jump() is False the mutations in
+        #between are walked through. run_cmd functions are not run and the
+        #rand fields of these packets are not used.
+        if index <= 0:
+            return self._seek(index, recurse)
+        state = random.getstate()
+        try:
+            if not self.can_jump():
+                self._seek(0, recurse)
+                for k in range(index):
+                    self.operate(dry=True)
+                    if not self.mutate(recurse):
+                        return False
+                return True
+            if not self._seek(index - 1, recurse):
+                return False
+            if not self._seek_from is None:
+                self._seek(self._seek_from - 1, recurse)
+                self.operate(dry=True)
+                curs = [ (i, i.cur) for i in self.objects if i.fuzz == "none" ]
+                self._seek(index - 1, recurse)
+                for (i, cur) in curs:
+                    i.cur = cur
+            self.operate(dry=True)
+        finally:
+            random.setstate(state)
+        return self.mutate(recurse)
+
+    def _seek(self, index, recurse):
+        self._touch()
+        self.cur_obj = None
+        self.last_obj = None
+        self.null_obj = False
+        self.fixed_objs = ()
+        self._seek_from = None
         for i in self.objects:
-            if i["_type"] == "rand":
-                new_rand = [ random.randint(0x00, 0xff) for j in range(i["bytelen"]) ]
-                i["cur"] = bytes(new_rand)
-            elif i["_type"] == "link":
-                i["cur"] = self.obj_dict[i["source"]]["cur"]
-            elif i["_type"] == "fill":
-                if len(self.obj_dict[i["source"]]["cur"]) % i["fillto"] != 0:
-                    i["cur"] = i["fillwith"] * (i["fillto"] - (len(self.obj_dict[i["source"]]["cur"]) % i["fillto"]))
-            elif i["_type"] == "padding":
-                length = self._get_obj_length(i["start"], i["end"])
-                mod = length % i["modulo"]
+            i.cur = i.default
+            if i._type == "grow":
+                i.length = i.orglen
+                i.bytelen = (i.length + 7) // 8
+        if index <= 0:
+            return True
+        (fields, counts) = self._get_fuzz_fields()
+        if len(fields) == 0:
+            return False
+        if recurse:
+            return self._seek_recursive(index - 1, fields, counts)
+        index -= 1
+        for k in range(len(counts)):
+            if index < counts[k]:
+                if k == len(fields):
+                    self.cur_obj = fields[-1] + 1
+                elif index == 0 and k > 0 and fields[k - 1] + 1 != fields[k]:
+                    #reached via a none field, which doesnt null the next one
+                    self.cur_obj = fields[k - 1] + 1
+                else:
+                    self.cur_obj = fields[k]
+                    self._set_value(self.objects[fields[k]], index)
+                return True
+            index -= counts[k]
+        return False
+
+    def snapshot(self):
+        #returns the state mutate() and operate() change, to go back to it
+        #with restore(). the values are not copied, as they are never
+        #changed in place.
+        sched = self._get_schedule()
+        objects = self.objects
+        return (self.cur_obj, self.last_obj, self.null_obj, self.fixed_objs,
+                tuple([ i.cur for i in objects ]),
+                tuple([ (objects[j].length, objects[j].bytelen) for j in sched["variable"] ]),
+                tuple([ (getattr(objects[j], "counter", None), getattr(objects[j], "counted", None)) for j in sched["counters"] ])
+                )
+
+    def restore(self, state):
+        sched = self._get_schedule()
+        objects = self.objects
+        (self.cur_obj, self.last_obj, self.null_obj, self.fixed_objs, curs, sizes, counters) = state
+        self._touch()
+        for (obj, cur) in zip(objects, curs):
+            obj.cur = cur
+        for (j, (length, bytelen)) in zip(sched["variable"], sizes):
+            objects[j].length = length
+            objects[j].bytelen = bytelen
+            self._resized(j)
+        for (j, (counter, counted)) in zip(sched["counters"], counters):
+            objects[j].counter = counter
+            objects[j].counted = counted
+
+    def _seek_recursive(self, index, fields, counts):
+        #in recursive mode the mutable fields behave like the digits of a
+        #counter. while digit 'top' is walked through, all digits below it
+        #run through all of their values for each value of 'top'.
+        top = 0
+        size = counts[0]
+        base = 0
+        while index >= size:
+            index -= size
+            base += size
+            top += 1
+            if top == len(counts):
+                for k in range(len(fields)):
+                    self._set_value(self.objects[fields[k]], counts[k] - 1)
+                if len(counts) > 1:
+                    self.last_obj = len(self.objects) - 1
+                if len(counts) == len(fields):
+                    self.null_obj = len(self.objects)
+                return False
+            size *= counts[top]
+        digits = []
+        for k in range(top + 1):
+            digits += [index % counts[k]]
+            index //= counts[k]
+        low = 0
+        while low < top and digits[low] == 0:
+            low += 1
+        #a field reached via a none field keeps its default value until
+        #it gets incremented the first time
+        skipped = top > 0 and (top == len(fields) or fields[top - 1] + 1 != fields[top])
+        for k in range(min(top + 1, len(fields))):
+            if k < low:
+                pos = counts[k] - 1
+            else:
+                pos = digits[k]
+            if k == top and pos == 0 and skipped:
+                continue
+            self._set_value(self.objects[fields[k]], pos)
+        self.cur_obj = fields[0]
+        if top > 0:
+            if digits[top] == 0 and skipped:
+                self.last_obj = fields[top - 1] + 1
+                self._seek_from = base + 1
+            else:
+                self.last_obj = fields[top]
+            if low == top and digits[top] == 0:
+                self.null_obj = fields[top - 1] + 1
+            else:
+                self.null_obj = fields[low]
+        elif digits[0] > 0:
+            self.null_obj = fields[0]
+        return True
+
+    def _get_schedule(self):
+        #resolves the fields used by the functions once and orders the
+        #functions, so that each one runs after those writing into its input
+        sched = self._schedule
+        if sched is not None and sched["objects"] is self.objects and sched["functions"] is self.functions and sched["count"] == (len(self.objects), len(self.functions)):
+            return sched
+        steps = []
+        for i in self.functions:
+            step = {    "func"      :   i,
+                        "dest"      :   None,
+                        "reads"     :   set(),
+                        "inputs"    :   None,
+                        "value"     :   None,
+                        "out"       :   None,
+                        "cache"     :   False,
+                        "update"    :   False
+                        }
+            if "dest" in i:
+                step["dest"] = self.objects.index(self.obj_dict[i["dest"]])
+            if i["func"] == "length" or i["func"] == "csum":
+                step["start"] = self.objects.index(self.obj_dict[i["start"]])
+                step["end"] = self.objects.index(self.obj_dict[i["end"]])
+                for j in range(step["start"], step["end"] + 1):
+                    if i["func"] == "csum":
+                        if j != step["dest"]:
+                            step["reads"].add(j)
+                    elif self.objects[j].length is None or self.objects[j]._type in ("padding", "grow"):
+                        step["reads"].add(j)
+                step["fields"] = sorted(step["reads"])
+                #lambdas get the whole dizz object, so they may read anything
+                step["cache"] = not "lambda_in" in i and not "lambda_out" in i
+                step["update"] = step["cache"] and i["func"] == "csum" and i["type"] != "custom" and self.CHECKSUM[i["type"]].get("update", False)
+            steps += [ step ]
+        order = []
+        todo = list(steps)
+        while todo:
+            for step in todo:
+                if not any(j is not step and j["dest"] in step["reads"] for j in todo):
+                    break
+            else:
+                #circular dependency, keep the order of the file
+                step = todo[0]
+            todo.remove(step)
+            order += [ step ]
+        #bit lengths of the fields and their prefix sums, which are valid
+        #up to index dirty
+        sizes = []
+        variable = []
+        padding = {}
+        counters = []
+        for (j, obj) in enumerate(self.objects):
+            if obj.length is None:
+                sizes += [ len(obj.cur) * 8 ]
+            else:
+                sizes += [ obj.length ]
+            if obj.length is None or obj._type in ("padding", "grow"):
+                variable += [ j ]
+            if obj._type == "padding":
+                padding[j] = (self.objects.index(self.obj_dict[obj.start]), self.objects.index(self.obj_dict[obj.end]))
+            if obj.fuzz != "none":
+                counters += [ j ]
+        #the fields set up by operate() itself, and for each field the
+        #functions to run again once it changed. length and csum depend on
+        #their input and destination fields, the others run every time.
+        special = [ j for j in range(len(self.objects)) if self.objects[j]._type in ("rand", "link", "fill", "padding", "grow") ]
+        users = [ [] for j in self.objects ]
+        always = []
+        for (k, step) in enumerate(order):
+            step["order"] = k
+            if (step["func"]["func"] == "length" or step["func"]["func"] == "csum") and step["cache"]:
+                for j in step["reads"] | { step["dest"] }:
+                    users[j] += [ k ]
+            else:
+                always += [ k ]
+        self._changed_all = True
+        self._pending = set()
+        sched = self._schedule = {  "objects"   :   self.objects,
+                                    "functions" :   self.functions,
+                                    "count"     :   (len(self.objects), len(self.functions)),
+                                    "steps"     :   order,
+                                    "sizes"     :   sizes,
+                                    "variable"  :   variable,
+                                    "padding"   :   padding,
+                                    "counters"  :   counters,
+                                    "special"   :   special,
+                                    "users"     :   users,
+                                    "always"    :   always,
+                                    "prefix"    :   [0] * (len(sizes) + 1),
+                                    "dirty"     :   0
+                                    }
+        return sched
+
+    def _touch(self, index=None):
+        #marks the field at index, or all fields, as changed by someone
+        #else than mutate(). operate() only runs the length and csum
+        #functions reading changed fields.
+        if index is None:
+            self._changed_all = True
+        else:
+            self._changed.add(index)
+
+    def _resized(self, index):
+        sched = self._schedule
+        obj = self.objects[index]
+        if obj.length is None:
+            bits = len(obj.cur) * 8
+        else:
+            bits = obj.length
+        if bits != sched["sizes"][index]:
+            sched["sizes"][index] = bits
+            if index < sched["dirty"]:
+                sched["dirty"] = index
+
+    def _get_range_length(self, start, end):
+        #bit length of the fields start to end from the prefix sums
+        sched = self._schedule
+        if sched["dirty"] <= end:
+            prefix = sched["prefix"]
+            sizes = sched["sizes"]
+            for j in range(sched["dirty"], end + 1):
+                prefix[j + 1] = prefix[j] + sizes[j]
+            sched["dirty"] = end + 1
+        return sched["prefix"][end + 1] - sched["prefix"][start]
+
+    def skip_random(self, count):
+        #uses up the random numbers count calls of operate() would take
+        for i in range(count * sum([ i.bytelen for i in self.objects if i._type == "rand" ])):
+            random.randint(0x00, 0xff)
+
+    def _update_csum(self, step, inputs):
+        #RFC 1624, the ones complement sum is corrected by the old and new
+        #words of the changed fields. only works for byte aligned fields
+        #keeping their size, otherwise the checksum is computed again.
+        s = step["sum"]
+        old = step["inputs"]
+        for k in itertools.compress(range(len(inputs)), map(operator.ne, inputs, old)):
+            obj = self.objects[step["fields"][k]]
+            (cur, length) = inputs[k]
+            (prev, prevlen) = old[k]
+            if length != prevlen or len(cur) != len(prev) or obj._name not in step["pos"]:
+                return None
+            if not length is None and length % 8 != 0:
+                return None
+            pos = step["pos"][obj._name]
+            if pos + len(cur) == step["size"] and step["size"] % 2:
+                #the trailing odd byte is not added the same by all variants
+                return None
+            pad = b"\x00" * (pos % 2)
+            tail = b"\x00" * ((pos + len(cur)) % 2)
+            s += int.from_bytes(pad + cur + tail, "big") - int.from_bytes(pad + prev + tail, "big")
+        s %= 0xFFFF
+        if s == 0:
+            #either 0 or 0xffff, depending on all bytes being zero
+            return None
+        output = struct.pack("!H", ~s & 0xFFFF)
+        step["sum"] = s
+        if SELFTEST:
+            dest = self.objects[step["dest"]]
+            dest.cur = dest.default
+            check = self.CHECKSUM[step["func"]["type"]]["call"](self._get_obj_data(step["start"], step["end"]))
+            if check != output:
+                raise dizz_runtimeException("incremental checksum '%s' differs from full computation: %s != %s" % (step["func"]["dest"], binascii.hexlify(output), binascii.hexlify(check)))
+        return output
+
+    def operate(self, dry=False):
+        #dry: run_cmd functions are not run
+        _DEBUG = DEBUG2
+        objects = self.objects
+        sched = self._get_schedule()
+        if self._changed_all:
+            changed = set(range(len(objects)))
+            for j in sched["variable"]:
+                self._resized(j)
+        else:
+            changed = self._changed
+            for j in changed:
+                self._resized(j)
+        self._changed = set()
+        self._changed_all = False
+        for index in sched["special"]:
+            i = objects[index]
+            old = i.cur
+            if i._type == "rand":
+                new_rand = [ random.randint(0x00, 0xff) for j in range(i.bytelen) ]
+                i.cur = bytes(new_rand)
+            elif i._type == "link":
+                i.cur = self.obj_dict[i.source].cur
+                self._resized(index)
+            elif i._type == "fill":
+                if len(self.obj_dict[i.source].cur) % i.fillto != 0:
+                    i.cur = i.fillwith * (i.fillto - (len(self.obj_dict[i.source].cur) % i.fillto))
+                    self._resized(index)
+            elif i._type == "padding":
+                (start, end) = sched["padding"][index]
+                length = self._get_range_length(start, end)
+                mod = length % i.modulo
                 if mod != 0:
-                    i["length"] = i["modulo"] - mod
-                    i["bytelen"] = i["length"] // 8
-                    if i["length"] % 8 > 0:
-                        i["bytelen"] += 1
-                    i["cur"] = i["default"] * i["bytelen"]
+                    i.length = i.modulo - mod
+                    i.bytelen = i.length // 8
+                    if i.length % 8 > 0:
+                        i.bytelen += 1
+                    i.cur = i.default * i.bytelen
                 else:
-                    i["length"] = 0
-                    i["bytelen"] = 0
-                    i["cur"] = b""
-            elif i["_type"] == "grow":
-                index = self.objects.index(self.obj_dict[i["_name"]])
+                    i.length = 0
+                    i.bytelen = 0
+                    i.cur = b""
+                self._resized(index)
+            elif i._type == "grow":
                 if index == self.cur_obj:
                     print("deb1") 
-                    if i["length"] < i["maxlen"]:
-                        i["length"] = i["length"] + 1
-                        i["bytelen"] = i["length"] // 8
-                        if i["length"] % 8 > 0:
-                            i["bytelen"] += 1
-                        times = (i["bytelen"] - len(i["default"])) // len(i["fill"])
-                        i["cur"] = i["default"] + i["fill"] * times
+                    if i.length < i.maxlen:
+                        i.length = i.length + 1
+                        i.bytelen = i.length // 8
+                        if i.length % 8 > 0:
+                            i.bytelen += 1
+                        times = (i.bytelen - len(i.default)) // len(i.fill)
+                        i.cur = i.default + i.fill * times
                     else:
-                        i["length"] = i["orglen"]
-                        i["cur"] = i["default"]
-        for i in self.functions:
-            if i["func"] == "length":
-                len_index = self.objects.index(self.obj_dict[i["dest"]])
-                if len_index != self.cur_obj and len_index != self.last_obj:
-                    start_index = self.objects.index(self.obj_dict[i["start"]])
-                    end_index = self.objects.index(self.obj_dict[i["end"]])
-                    length = 0
-                    for j in range(start_index, end_index + 1):
-                        if not self.objects[j]["length"] is None:
-                            length += self.objects[j]["length"]
-                        else:
-                            length += len(self.objects[j]["cur"]) * 8
-                    length = length // 8
-                    if "lambda" in i:
-                        length = i["lambda"](length)
-                    if i["flavour"] == "ascii":
-                        try:
-                            self.objects[len_index]["cur"] = bytes(str(length).encode(CODEC))
-                        except:
-                            if DEBUG:
-                                print("Can't update ascii_length, zeroing...")
-                            self.objects[len_index]["cur"] = bytes("0".encode(CODEC))
-                    else:
-                        try:
-                            self.objects[len_index]["cur"] = tools.pack_with_length(length, self.objects[len_index]["length"], i["endian"])
-                        except:
-                            if DEBUG:
-                                print("Can't update length, maxing out...")
-                            self.objects[len_index]["cur"] = tools.pack_with_length(int(math.pow(2, self.objects[len_index]["length"])) - 1, self.objects[len_index]["length"])
-                    if _DEBUG:
-                        print("LENGTH: dest: %s, start: %s, end: %s, len: %d" % (i["dest"], i["start"], i["end"], length))
-            elif i["func"] == "csum":
-                sum_index = self.objects.index(self.obj_dict[i["dest"]])
-                if sum_index != self.cur_obj:
-                    self.objects[sum_index]["cur"] = self.objects[sum_index]["default"]
-                    inp = self._get_obj_data(i["start"], i["end"])
-                    if "lambda_in" in i:
-                        inp = i["lambda_in"](self, inp)
-                    if i["type"] == "custom":
-                        output = i["callback"](inp)
-                    else:
-                        output = self.CHECKSUM[i["type"]]["call"](inp)
-                    if "lambda_out" in i:
-                        output = i["lambda_out"](self, output)
-                    self.objects[sum_index]["cur"] = output
-            elif i["func"] == "time":
-                time_index = self.objects.index(self.obj_dict[i["dest"]])
-                if time_index != self.cur_obj:
-                    now = time.time() + i["offset"]
-                    secs = int(now)
-                    if i["flavour"] == "no_fracs":
-                        self.objects[time_index]["cur"] = tools.pack_with_length(secs, 64)
-                    else:
-                        fracs = int((now - secs) * 65536)
-                        self.objects[time_index]["cur"] = tools.pack_with_length(secs, 48) + tools.pack_with_length(fracs, 18)
-            elif i["func"] == "run_cmd":
-                try:
-                    if DEBUG:
-                        print("running '%s'" % i["cmd"])
-                    subprocess.call(i["cmd"], shell=True)
-                except Exception as e:
-                    raise dizz_sessionException("error on executing %s: '%s'" % (self.cmd, str(e)))
+                        i.length = i.orglen
+                        i.cur = i.default
+                    self._resized(index)
+            if i.cur != old:
+                changed.add(index)
+        #length and csum are only run if one of their input fields or the
+        #destination field changed since the last call. a function which
+        #cant write its destination now is run on the next call.
+        steps = sched["steps"]
+        users = sched["users"]
+        todo = set(self._pending)
+        self._pending = set()
+        todo.update(sched["always"])
+        for j in changed:
+            todo.update(users[j])
+        queue = sorted(todo)
+        heapq.heapify(queue)
+        while queue:
+            k = heapq.heappop(queue)
+            step = steps[k]
+            i = step["func"]
+            dest = step["dest"]
+            if not dest is None:
+                out = objects[dest].cur
+            self._run_step(step, dry)
+            if dest is None:
+                continue
+            if step["cache"] and (dest == self.cur_obj or dest in self.fixed_objs or (i["func"] == "length" and dest == self.last_obj)):
+                self._pending.add(k)
+            elif objects[dest].cur != out:
+                for u in users[dest]:
+                    if u > k:
+                        if not u in todo:
+                            todo.add(u)
+                            heapq.heappush(queue, u)
+                    elif u < k:
+                        self._pending.add(u)
+
+    def _run_step(self, step, dry):
+        _DEBUG = DEBUG2
+        objects = self.objects
+        i = step["func"]
+        if i["func"] == "length":
+            len_index = step["dest"]
+            if len_index != self.cur_obj and len_index != self.last_obj and not len_index in self.fixed_objs:
+                length = self._get_range_length(step["start"], step["end"]) // 8
+                if "lambda" in i:
+                    length = i["lambda"](length)
+                if length == step["value"] and objects[len_index].cur is step["out"]:
+                    return
+                if i["flavour"] == "ascii":
+                    try:
+                        objects[len_index].cur = bytes(str(length).encode(CODEC))
+                    except:
+                        if DEBUG:
+                            print("Can't update ascii_length, zeroing...")
+                        objects[len_index].cur = bytes("0".encode(CODEC))
+                else:
+                    try:
+                        objects[len_index].cur = tools.pack_with_length(length, objects[len_index].length, i["endian"])
+                    except:
+                        if DEBUG:
+                            print("Can't update length, maxing out...")
+                        objects[len_index].cur = tools.pack_with_length(int(math.pow(2, objects[len_index].length)) - 1, objects[len_index].length)
+                step["value"] = length
+                step["out"] = objects[len_index].cur
+                self._resized(len_index)
+                if _DEBUG:
+                    print("LENGTH: dest: %s, start: %s, end: %s, len: %d" % (i["dest"], i["start"], i["end"], length))
+        elif i["func"] == "csum":
+            sum_index = step["dest"]
+            if sum_index != self.cur_obj and not sum_index in self.fixed_objs:
+                if step["cache"]:
+                    inputs = [ (objects[j].cur, objects[j].length) for j in step["fields"] ]
+                    if objects[sum_index].cur is step["out"]:
+                        if inputs == step["inputs"]:
+                            return
+                        if step["update"]:
+                            output = self._update_csum(step, inputs)
+                            if not output is None:
+                                objects[sum_index].cur = output
+                                self._resized(sum_index)
+                                step["inputs"] = inputs
+                                step["out"] = output
+                                return
+                objects[sum_index].cur = objects[sum_index].default
+                if step["update"]:
+                    step["pos"] = {}
+                    inp = self._get_obj_data(step["start"], step["end"], positions=step["pos"])
+                else:
+                    inp = self._get_obj_data(step["start"], step["end"])
+                if "lambda_in" in i:
+                    inp = i["lambda_in"](self, inp)
+                if i["type"] == "custom":
+                    output = i["callback"](inp)
+                else:
+                    output = self.CHECKSUM[i["type"]]["call"](inp)
+                if "lambda_out" in i:
+                    output = i["lambda_out"](self, output)
+                objects[sum_index].cur = output
+                self._resized(sum_index)
+                if step["cache"]:
+                    step["inputs"] = inputs
+                    step["out"] = output
+                if step["update"]:
+                    step["sum"] = ~int.from_bytes(output, "big") & 0xFFFF
+                    step["size"] = len(inp)
+        elif i["func"] == "time":
+            time_index = step["dest"]
+            if time_index != self.cur_obj and not time_index in self.fixed_objs:
+                now = time.time() + i["offset"]
+                secs = int(now)
+                if i["flavour"] == "no_fracs":
+                    objects[time_index].cur = tools.pack_with_length(secs, 64)
+                else:
+                    fracs = int((now - secs) * 65536)
+                    objects[time_index].cur = tools.pack_with_length(secs, 48) + tools.pack_with_length(fracs, 18)
+        elif i["func"] == "run_cmd" and not dry:
+            try:
+                if DEBUG:
+                    print("running '%s'" % i["cmd"])
+                subprocess.call(i["cmd"], shell=True)
+            except Exception as e:
+                raise dizz_sessionException("error on executing %s: '%s'" % (self.cmd, str(e)))
 
 ######### OBJECTS ##########
 
@@ -933,48 +2146,49 @@ class dizz(object):
             cur = bytes(default.encode(CODEC))
         else:
             cur = bytes(default)
-        obj  = {    "_type"     :   "basic",
-                    "_name"     :   name,
-                    "length"    :   length,
-                    "default"   :   cur,
-                    "fuzz"      :   fuzz,
-                    "endian"    :   endian,
-                    "encoding"  :   encoding,
+        obj  = dizz_field({ "_type"     :   "basic",
+                           "_name"     :   name,
+                           "length"    :   length,
+                           "default"   :   cur,
+                           "fuzz"      :   fuzz,
+                           "endian"    :   endian,
+                           "encoding"  :   encoding,
 
-                    "bytelen"   :   bytelen,
-                    "cur"       :   cur
-                    }
+                           "bytelen"   :   bytelen,
+                           "cur"       :   cur
+                           })
         self.obj_dict[name] = obj
         return obj
 
     def fill_dizz(self, name, source, fillto, fillwith):
         if source not in self.obj_dict:
             raise dizz_parseException("cannot find source dizz %s" % source)
-        if not (self.obj_dict[source]["length"] is None):
+        if not (self.obj_dict[source].length is None):
             raise dizz_parseException("cannot create fill dizz for source with len!=None: %s" % name)
         dflt = ''
-        if len(self.obj_dict[source]["cur"]) % fillto != 0:
-            dflt = fillwith * (fillto - (len(self.obj_dict[source]["cur"]) % fillto))
+        if len(self.obj_dict[source].cur) % fillto != 0:
+            dflt = fillwith * (fillto - (len(self.obj_dict[source].cur) % fillto))
         obj = self.basic_dizz(name, None, dflt, "none")
-        obj["_type"] = "fill"
-        obj["source"] = source
-        obj["fillto"] = fillto
-        obj["fillwith"] = fillwith
+        obj._type = "fill"
+        obj.source = source
+        obj.fillto = fillto
+        obj.fillwith = fillwith
         return obj
 
     def list_dizz(self, name, default, listname, ascii=True):
         obj = self.basic_dizz(name, None, default, "std")
-        obj["_type"] = "list"
-        obj["listname"] = listname
+        obj._type = "list"
+        obj.listname = listname
         self.library.load_strings(listname, listname, ascii=ascii)
+        self.lists += [ (listname, ascii) ]
         return obj
         
     def link_dizz(self, name, source):
         if source not in self.obj_dict:
             raise dizz_parseException("cannot find source dizz %s" % source)
-        obj = self.basic_dizz(name, self.obj_dict[source]["length"], self.obj_dict[source]["default"], "none")
-        obj["_type"] = "link"
-        obj["source"] = source
+        obj = self.basic_dizz(name, self.obj_dict[source].length, self.obj_dict[source].default, "none")
+        obj._type = "link"
+        obj.source = source
         return obj
     
     def rand_dizz(self, name, length, encoding=None):
@@ -984,7 +2198,7 @@ class dizz(object):
         if length % 8 != 0:
             bytelen += 1
         obj = self.basic_dizz(name, length, "\x00" * bytelen, "none", encoding=encoding)
-        obj["_type"] = "rand"
+        obj._type = "rand"
         return obj
     
     def padding_dizz(self, name, start, end, modulo, value):
@@ -993,18 +2207,18 @@ class dizz(object):
         if end not in self.obj_dict:
             raise dizz_parseException("end field '%s' unknown!" % end)
         obj = self.basic_dizz(name, None, value, "none")
-        obj["_type"] = "padding"
-        obj["start"] = start
-        obj["end"] = end
-        obj["modulo"] = modulo
+        obj._type = "padding"
+        obj.start = start
+        obj.end = end
+        obj.modulo = modulo
         return obj
     
     def grow_dizz(self, name, length, default, fuzz, fill, maxlen, endian='!', encoding=None):
         obj = self.basic_dizz(name, length, default, fuzz, endian, encoding)
-        obj["_type"] = "grow"
-        obj["orglen"] = length
-        obj["fill"] = fill
-        obj["maxlen"] = maxlen
+        obj._type = "grow"
+        obj.orglen = length
+        obj.fill = fill
+        obj.maxlen = maxlen
         return obj
     
 ######### FUNCTIONS ##########
@@ -1017,7 +2231,7 @@ class dizz(object):
     def basic_time(self, dest, offset=0):
         if dest not in self.obj_dict:
             raise dizz_parseException("destination field '%s' unknown!" % dest)
-        if self.obj_dict[dest]["length"] != 64:
+        if self.obj_dict[dest].length != 64:
             raise dizz_parseException("destination of time '%s' got len != 64!" % dest)
         if not isinstance(offset, int) and not isinstance(offset, float):
             raise dizz_parseException("offset must be of type int or float!")
@@ -1072,8 +2286,8 @@ class dizz(object):
         else:
             if cstype not in self.CHECKSUM:
                 raise dizz_parseException("unknown checksum '%s'!" % cstype)
-            if self.CHECKSUM[cstype]["length"] != self.obj_dict[dest]["length"]:
-                raise dizz_parseException("length of destination field doesnt match checksum length: %i != %i" % (self.CHECKSUM[cstype]["length"], self.obj_dict[dest]["length"]))
+            if self.CHECKSUM[cstype]["length"] != self.obj_dict[dest].length:
+                raise dizz_parseException("length of destination field doesnt match checksum length: %i != %i" % (self.CHECKSUM[cstype]["length"], self.obj_dict[dest].length))
         return {    "func"      :   "csum",
                     "dest"      :   dest,
                     "start"     :   start,
@@ -1093,21 +2307,179 @@ class dizz(object):
         func["lambda_out"] = lambout
         return func
     
+    def inet_sum(data, csum=0, odd=0):
+        #ones complement sum of the 16 bit words. as 2^16 = 1 mod 0xffff the
+        #sum of the words is the value of the data mod 0xffff, only a non
+        #zero sum must end up as 0xffff instead of 0.
+        even = len(data) & ~1
+        value = int.from_bytes(data[:even], "big")
+        total = value % 0xFFFF + odd + csum
+        if total % 0xFFFF == 0:
+            if value or total:
+                return 0xFFFF
+            return 0
+        return total % 0xFFFF
+
     def csum_inet(data, csum=0):
-        for i in range(0,len(data),2):
-            if i + 1 >= len(data):
-                csum += data[i] & 0xFF
-            else:
-                w = ((data[i] << 8) & 0xFF00) + (data[i+1] & 0xFF)
-                csum += w
-        while (csum >> 16) > 0:
-            csum = (csum & 0xFFFF) + (csum >> 16)
-        csum = ~csum
-        return struct.pack("!H", csum & 0xFFFF)
+        #a trailing odd byte is added as the low byte of a word
+        if len(data) % 2:
+            csum = dizz.inet_sum(data, csum, data[-1])
+        else:
+            csum = dizz.inet_sum(data, csum)
+        return struct.pack("!H", ~csum & 0xFFFF)
+
+    def csum_inet_rfc(data, csum=0):
+        #RFC 1071, a trailing odd byte is padded with zero
+        if len(data) % 2:
+            csum = dizz.inet_sum(data, csum, data[-1] << 8)
+        else:
+            csum = dizz.inet_sum(data, csum)
+        return struct.pack("!H", ~csum & 0xFFFF)
+
+    def pseudo_ip4(data, proto):
+        #the range starts with the ip header, the pseudo header is made of
+        #its addresses, the protocol and the length of the rest. a fuzzed
+        #ihl may point behind the range, the header ends there then.
+        if len(data) == 0:
+            return 0, data
+        hlen = min((data[0] & 0x0F) * 4, len(data))
+        return dizz.inet_sum(data[12:20].ljust(8, b"\x00") + struct.pack("!HH", proto, (len(data) - hlen) & 0xFFFF)), data[hlen:]
+
+    def pseudo_ip6(data, proto):
+        #the range starts with the ipv6 header, extension headers are not
+        #skipped. a range shorter than the header gets no pseudo header.
+        if len(data) < 40:
+            return 0, data[40:]
+        return dizz.inet_sum(data[8:40] + struct.pack("!IxxxB", (len(data) - 40) & 0xFFFFFFFF, proto)), data[40:]
+
+    def csum_tcp4(data):
+        (csum, data) = dizz.pseudo_ip4(data, 6)
+        return dizz.csum_inet_rfc(data, csum)
+
+    def csum_udp4(data):
+        (csum, data) = dizz.pseudo_ip4(data, 17)
+        return dizz.csum_inet_rfc(data, csum).replace(b"\x00\x00", b"\xff\xff")
+
+    def csum_tcp6(data):
+        (csum, data) = dizz.pseudo_ip6(data, 6)
+        return dizz.csum_inet_rfc(data, csum)
+
+    def csum_udp6(data):
+        (csum, data) = dizz.pseudo_ip6(data, 17)
+        return dizz.csum_inet_rfc(data, csum).replace(b"\x00\x00", b"\xff\xff")
+
+    CRC32C = tools.crc(32, 0x82F63B78)
+    CRC16 = tools.crc(16, 0xA001)
+
+    def csum_crc32(data):
+        return struct.pack("!I", zlib.crc32(data))
+
+    def csum_crc32c(data):
+        return struct.pack("!I", dizz.CRC32C(data, 0xFFFFFFFF) ^ 0xFFFFFFFF)
+
+    def csum_sctp(data):
+        #crc32c as sctp puts it into the common header, low byte first
+        return struct.pack("<I", dizz.CRC32C(data, 0xFFFFFFFF) ^ 0xFFFFFFFF)
+
+    def csum_crc16(data):
+        #CRC-16/ARC
+        return struct.pack("!H", dizz.CRC16(data))
+
+    def csum_crc16_modbus(data):
+        #low byte first, as modbus sends it
+        return struct.pack("<H", dizz.CRC16(data, 0xFFFF))
+
+    def csum_crc16_ccitt(data):
+        #CRC-16/CCITT-FALSE
+        return struct.pack("!H", binascii.crc_hqx(data, 0xFFFF))
+
+    def csum_crc16_xmodem(data):
+        return struct.pack("!H", binascii.crc_hqx(data, 0))
+
+    def csum_adler32(data):
+        return struct.pack("!I", zlib.adler32(data))
+
+    def csum_fletcher16(data):
+        #the second sum is the sum of all running sums of the first, that
+        #is sum((n - i) * data[i]). as 256 ** i is 1 + 255 * i modulo
+        #255 ** 2, the message read as a little endian number gives
+        #sum(i * data[i]) modulo 255 without a loop over the bytes.
+        first = sum(data)
+        weighted = (int.from_bytes(data, "little") - first) % 65025 // 255
+        return struct.pack("!BB", (len(data) * first - weighted) % 255, first % 255)
+
+    def csum_fletcher32(data):
+        #over 16 bit little endian words like the common definition, a
+        #trailing odd byte is padded with zero. like csum_fletcher16 with
+        #65536 ** i being 1 + 65535 * i modulo 65535 ** 2.
+        if len(data) % 2:
+            data = bytes(data) + b"\x00"
+        first = sum(data[0::2]) + (sum(data[1::2]) << 8)
+        weighted = (int.from_bytes(data, "little") - first) % 0xFFFE0001 // 0xFFFF
+        return struct.pack("!HH", (len(data) // 2 * first - weighted) % 0xFFFF, first % 0xFFFF)
+
+    def csum_inet_batch(rows):
+        #csum_inet() for each row of a 2-D numpy array
+        data = rows.astype(numpy.uint64)
+        length = rows.shape[1]
+        csum = (data[:, 0:length - 1:2] << numpy.uint64(8)).sum(axis=1) + data[:, 1::2].sum(axis=1)
+        if length % 2:
+            csum += data[:, length - 1]
+        while (csum >> numpy.uint64(16)).any():
+            csum = (csum & numpy.uint64(0xFFFF)) + (csum >> numpy.uint64(16))
+        return ~csum & numpy.uint64(0xFFFF)
 
     CHECKSUM = {    "inet"      :   {   "length" :   16,
-                                        "call"   :   csum_inet
+                                        "call"   :   csum_inet,
+                                        "batch"  :   csum_inet_batch,
+                                        "update" :   True
+                                        },
+                    "inet_rfc"  :   {   "length" :   16,
+                                        "call"   :   csum_inet_rfc,
+                                        "update" :   True
+                                        },
+                    "tcp4"      :   {   "length" :   16,
+                                        "call"   :   csum_tcp4
+                                        },
+                    "udp4"      :   {   "length" :   16,
+                                        "call"   :   csum_udp4
+                                        },
+                    "tcp6"      :   {   "length" :   16,
+                                        "call"   :   csum_tcp6
+                                        },
+                    "udp6"      :   {   "length" :   16,
+                                        "call"   :   csum_udp6
                                         },
+                    "crc32"     :   {   "length" :   32,
+                                        "call"   :   csum_crc32
+                                        },
+                    "crc32c"    :   {   "length" :   32,
+                                        "call"   :   csum_crc32c
+                                        },
+                    "sctp"      :   {   "length" :   32,
+                                        "call"   :   csum_sctp
+                                        },
+                    "crc16"     :   {   "length" :   16,
+                                        "call"   :   csum_crc16
+                                        },
+                    "crc16_modbus"  :   {   "length" :   16,
+                                            "call"   :   csum_crc16_modbus
+                                            },
+                    "crc16_ccitt"   :   {   "length" :   16,
+                                            "call"   :   csum_crc16_ccitt
+                                            },
+                    "crc16_xmodem"  :   {   "length" :   16,
+                                            "call"   :   csum_crc16_xmodem
+                                            },
+                    "adler32"   :   {   "length" :   32,
+                                        "call"   :   csum_adler32
+                                        },
+                    "fletcher16"    :   {   "length" :   16,
+                                            "call"   :   csum_fletcher16
+                                            },
+                    "fletcher32"    :   {   "length" :   32,
+                                            "call"   :   csum_fletcher32
+                                            },
                     "none"      :   {   "length" :   None,
                                         "call"   :   lambda x: x
                                         }
@@ -1129,6 +2501,18 @@ class interaction(object):
 
     def load(self, filename):
         self.filename = filename
+        model = read_cache(filename)
+        if not model is None:
+            #the dizz files of the steps are cached on their own
+            self.name = model["name"]
+            self.objects = []
+            for (kind, name, dizzfile, readlen) in model["objects"]:
+                if kind == "dizz":
+                    self.objects += [ self.dizz_obj(name, dizzfile, readlen) ]
+                else:
+                    self.objects += [ self.null_dizz_obj(name, readlen) ]
+            self.functions = model["functions"]
+            return
         global interaction_globals
         ns = {  "dizz"  :   self.dizz_obj,
                 "null_dizz"  :   self.null_dizz_obj,
@@ -1143,6 +2527,10 @@ class interaction(object):
         self.name = ns["name"]
         self.objects = ns["objects"]
         self.functions = ns["functions"]
+        write_cache(filename, { "name"      :   self.name,
+                                "objects"   :   [ (i["type"], i["name"], i["dizz"].filename, i["readlen"]) for i in self.objects ],
+                                "functions" :   self.functions
+                                })
 
     def save(self, filename):        
         pp = pprint.PrettyPrinter(indent=4)
@@ -1211,7 +2599,18 @@ class interaction(object):
             return "%s: %s" % (self.objects[self.gen_obj]["name"], self.objects[self.gen_obj]["dizz"].get_current(recurse))
         return None
 
-    def generate(self, recurse, test=False):
+    def _get_packet(self, index, dry):
+        d = self.objects[index]["dizz"]
+        if dry:
+            if d.can_jump():
+                d.skip_random(1)
+            else:
+                d.operate(dry=True)
+            return b""
+        d.operate()
+        return d.generate()
+
+    def generate(self, recurse, test=False, dry=False):
         _DEBUG = DEBUG2
         ret = b""
         rlen = None
@@ -1221,8 +2620,7 @@ class interaction(object):
             print("cur: %d\tgen: %d" % (self.cur_obj, self.gen_obj))
 
         if self.gen_obj < self.cur_obj:
-            self.objects[self.gen_obj]["dizz"].operate()
-            ret = self.objects[self.gen_obj]["dizz"].generate()
+            ret = self._get_packet(self.gen_obj, dry)
             rlen = self.objects[self.gen_obj]["readlen"]
             self.gen_obj += 1
         else:
@@ -1231,8 +2629,7 @@ class interaction(object):
             else:
                 more = False
             if not more:
-                self.objects[self.cur_obj]["dizz"].operate()
-                ret = self.objects[self.cur_obj]["dizz"].generate()
+                ret = self._get_packet(self.cur_obj, dry)
                 rlen = self.objects[self.cur_obj]["readlen"]
                 if not self._next_obj():
                     if _DEBUG:
@@ -1240,11 +2637,77 @@ class interaction(object):
                     done = True
             else:
                 self.gen_obj = 0
-                self.objects[self.cur_obj]["dizz"].operate()
-                ret = self.objects[self.cur_obj]["dizz"].generate()
+                ret = self._get_packet(self.cur_obj, dry)
                 rlen = self.objects[self.cur_obj]["readlen"]
         return (ret, rlen, done)
 
+    def skip(self, count, recurse):
+        #walks through count test cases like the main loop does, without
+        #generating packets. unlike seek() this uses up the random numbers
+        #of rand fields on the way.
+        for i in range(count):
+            while True:
+                (_, _, done) = self.generate(recurse, dry=True)
+                if done:
+                    return False
+                if self.gen_obj == 0:
+                    break
+        return True
+
+    def has_random(self):
+        for i in self.objects:
+            for j in i["dizz"].objects:
+                if j._type == "rand":
+                    return True
+        return False
+
+    def get_test_count(self, recurse):
+        count = 0
+        for i in self.objects:
+            count += i["dizz"].get_mutation_count(recurse)
+        if len(self.objects) > 1:
+            return count + 2
+        return count + 1
+
+    def seek(self, index, recurse):
+        #skip the first 'index' test cases, see dizz.seek(). the last dizz
+        #of a step is sent together with the first mutation of the next
+        #step, so only the first and the last step got an extra test case.
+        self.gen_obj = 0
+        found = None
+        for i in range(len(self.objects)):
+            d = self.objects[i]["dizz"]
+            if not found is None:
+                d.seek(0, recurse)
+                continue
+            count = d.get_mutation_count(recurse)
+            if index <= count:
+                d.seek(index, recurse)
+                self.cur_obj = found = i
+            else:
+                d.seek(count + 1, recurse)
+                if i == 0:
+                    index -= count + 1
+                else:
+                    index -= count
+        #generate() runs operate() after mutate(), so the walk leaves each
+        #dizz operated on. the dizzes are also operated on when loaded.
+        state = random.getstate()
+        for i in self.objects:
+            i["dizz"].operate(dry=True)
+        random.setstate(state)
+        return not found is None
+
+    def snapshot(self):
+        #see dizz.snapshot(), this includes the values copied from the
+        #answers into the dizzes of later steps
+        return (self.cur_obj, self.gen_obj, tuple([ i["dizz"].snapshot() for i in self.objects ]))
+
+    def restore(self, state):
+        (self.cur_obj, self.gen_obj, states) = state
+        for (i, s) in zip(self.objects, states):
+            i["dizz"].restore(s)
+
     def operate(self, inp=None):
         _DEBUG = DEBUG2
         if _DEBUG:
@@ -1254,19 +2717,21 @@ class interaction(object):
             for i in self.functions:
                 if i["step"] == self.gen_obj or i["step"] == -1:
                     if i["func"] == "copy":
-                        self.objects[self.gen_obj]["dizz"].obj_dict[i["dest"]]["cur"] = inp[i["start"]:i["end"]]
+                        self.objects[self.gen_obj]["dizz"].obj_dict[i["dest"]].cur = inp[i["start"]:i["end"]]
+                        self.objects[self.gen_obj]["dizz"]._touch()
                     elif i["func"] == "adv_copy":
                         i["callback"](self.objects[self.gen_obj], inp)
+                        self.objects[self.gen_obj]["dizz"]._touch()
                     elif i["func"] == "print_dizz":
                         pp = pprint.PrettyPrinter()
                         pp.pprint(self.objects[self.gen_obj]["dizz"].objects)
                     elif i["func"] == "print_field":
                         if not i["field"] is None:
-                            print(self.objects[self.gen_obj]["dizz"].obj_dict[i["field"]]["cur"])
+                            print(self.objects[self.gen_obj]["dizz"].obj_dict[i["field"]].cur)
                         else:
                             obj = self.objects[self.gen_obj]["dizz"].cur_obj
                             if not obj is None:     #ugly!!!
-                                print(self.objects[self.gen_obj]["dizz"].objects[obj]["cur"])
+                                print(self.objects[self.gen_obj]["dizz"].objects[obj].cur)
         
     def basic_copy(self, step, dest, start, end):
         obj = { "func"  :   "copy",
@@ -1298,6 +2763,351 @@ class interaction(object):
                 }
         return obj
 
+class dizz_journal(object):
+    #appends the progress of a run to a file, one python literal per line.
+    #a checkpoint holds the test case to continue with and the state of the
+    #random module after the one before, so --resume gets the same packets
+    #as the interrupted run. records are written out and fsync'ed at most
+    #every 'interval' seconds.
+    def __init__(self, filename, interval=1.0):
+        self.filename = filename
+        self.interval = interval
+        self.next = 0
+        self.base = 0
+        self.session = None
+        self.f = io.open(filename, "a", encoding=CODEC)
+
+    def begin(self, source, options, num, index):
+        #num is the test case number printed, index the one seek() takes
+        self.base = num - index
+        self.session = "%s %s %s" % (options.out_type, options.out_dest, options.out_extra)
+        self._write({   "type"      :   "start",
+                        "file"      :   source,
+                        "version"   :   VERSION,
+                        "recurse"   :   options.recurse,
+                        "session"   :   self.session,
+                        "num"       :   num,
+                        "index"     :   index,
+                        "time"      :   time.time()
+                        })
+        self.flush()
+
+    def _write(self, record):
+        self.f.write(repr(record) + "\n")
+
+    def checkpoint(self, num, step=None, force=False):
+        #num is the next test case to run
+        now = time.time()
+        if now < self.next and not force:
+            return
+        self._write({   "type"      :   "checkpoint",
+                        "num"       :   num,
+                        "index"     :   num - self.base,
+                        "step"      :   step,
+                        "session"   :   self.session,
+                        "random"    :   random.getstate(),
+                        "time"      :   now
+                        })
+        self.flush()
+        self.next = now + self.interval
+
+    def anomaly(self, num, what):
+        #written out with the next checkpoint
+        self._write({   "type"      :   "anomaly",
+                        "num"       :   num,
+                        "what"      :   what,
+                        "time"      :   time.time()
+                        })
+
+    def finish(self, num):
+        self._write({   "type"      :   "done",
+                        "num"       :   num,
+                        "time"      :   time.time()
+                        })
+        self.close()
+
+    def flush(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self):
+        if not self.f.closed:
+            self.flush()
+            self.f.close()
+
+    @staticmethod
+    def read(filename):
+        #returns (start, checkpoint, anomalies, done) of the last run in
+        #the journal. a line cut off by a crash is skipped.
+        start = None
+        checkpoint = None
+        anomalies = []
+        done = False
+        with io.open(filename, encoding=CODEC) as f:
+            for line in f:
+                try:
+                    record = ast.literal_eval(line)
+                    record["type"]
+                except Exception:
+                    continue
+                if record["type"] == "start":
+                    if start is None:
+                        start = record
+                    done = False
+                elif record["type"] == "checkpoint":
+                    checkpoint = record
+                elif record["type"] == "anomaly":
+                    anomalies.append(record)
+                elif record["type"] == "done":
+                    done = True
+        if start is None:
+            raise dizz_runtimeException("no run found in journal %s" % filename)
+        return (start, checkpoint, anomalies, done)
+
+def cache_key(filename):
+    with open(filename, "rb") as f:
+        st = os.fstat(f.fileno())
+        digest = hashlib.blake2b(f.read(), digest_size=16).digest()
+    return (os.path.abspath(filename), st.st_mtime_ns, st.st_size, digest, VERSION, sys.implementation.cache_tag)
+
+def cache_file(filename):
+    #the cache files are kept in a directory of the user, not next to the
+    #models, named after the path of the model
+    directory = CACHE_DIR
+    if directory is None:
+        directory = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "dizzy")
+    name = hashlib.blake2b(os.path.abspath(filename).encode(CODEC), digest_size=16).hexdigest()
+    return (directory, os.path.join(directory, name + ".cache"))
+
+def builtins_only(code):
+    #True if code (a lambda of a dizz file) uses no globals but builtins
+    for i in dis.get_instructions(code):
+        if i.opname in ("LOAD_GLOBAL", "LOAD_NAME", "STORE_GLOBAL", "STORE_NAME", "DELETE_GLOBAL", "DELETE_NAME") and not i.argval in builtins.__dict__:
+            return False
+    for i in code.co_consts:
+        if isinstance(i, types.CodeType) and not builtins_only(i):
+            return False
+    return True
+
+def load_function(code, defaults):
+    return types.FunctionType(marshal.loads(code), { "__builtins__" : builtins }, None, defaults)
+
+class cache_pickler(pickle.Pickler):
+    #functions defined in a model file cant be pickled by reference, their
+    #bytecode is stored instead, if they dont need the namespace of the file
+    def reducer_override(self, obj):
+        if isinstance(obj, types.FunctionType) and getattr(sys.modules.get(obj.__module__), obj.__qualname__, None) is not obj:
+            if obj.__closure__ is None and builtins_only(obj.__code__):
+                return (load_function, (marshal.dumps(obj.__code__), obj.__defaults__))
+        return NotImplemented
+
+def read_cache(filename):
+    #returns what write_cache() stored for the model in filename, if the
+    #model did not change since, or None. unpickling runs code, so only
+    #cache files of the current user, which no one else can write to, are
+    #read.
+    if not CACHE:
+        return None
+    try:
+        key = cache_key(filename)
+        (_, path) = cache_file(filename)
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if st.st_uid != os.getuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                if DEBUG:
+                    print("Not reading %s, it is not owned by you or writable by others" % path)
+                return None
+            if pickle.load(f) != key:
+                return None
+            return pickle.load(f)
+    except Exception:
+        return None
+
+def write_cache(filename, model):
+    #stores the model loaded from filename in the cache directory. models
+    #which cannot be pickled (functions using the namespace of the file)
+    #are not cached.
+    if not CACHE:
+        return
+    try:
+        data = io.BytesIO()
+        p = cache_pickler(data, pickle.HIGHEST_PROTOCOL)
+        p.dump(cache_key(filename))
+        p.clear_memo()
+        p.dump(model)
+        data = data.getvalue()
+        (directory, path) = cache_file(filename)
+        os.makedirs(directory, 0o700, exist_ok=True)
+        tmp = "%s.%d" % (path, os.getpid())
+        with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+            os.fchmod(f.fileno(), 0o600)
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception as e:
+        if DEBUG:
+            print("Cant cache %s: %s" % (filename, str(e)))
+
+def fork_range(options, name, close=[]):
+    #forks a process running a range of test cases, with its stdout going
+    #into a pipe. returns None in the child and (pid, fd) in the parent.
+    sys.stdout.flush()
+    #the random module reseeds itself in forked children
+    state = random.getstate()
+    (r, w) = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        random.setstate(state)
+        os.close(r)
+        for j in close:
+            os.close(j)
+        os.dup2(w, 1)
+        os.close(w)
+        sys.stdout.reconfigure(line_buffering=True)
+        if options.out_type == "file":
+            options.out_dest = "%s-%s" % (options.out_dest, name)
+        return None
+    os.close(w)
+    return (pid, r)
+
+def read_lines(fd, buf):
+    #returns (lines, rest, eof) of the output of a forked child
+    data = os.read(fd, 65536)
+    if not data:
+        lines = [ buf ] if buf else []
+        return ([ i.decode(CODEC, "replace") for i in lines ], b"", True)
+    lines = (buf + data).split(b"\n")
+    buf = lines.pop()
+    return ([ i.decode(CODEC, "replace") for i in lines ], buf, False)
+
+def print_progress(done, sched):
+    #prints the number of test cases done on the schedule of the main loop,
+    #or after each PROGRESS_BLOCK test cases if set
+    if done >= sched[0]:
+        if not PROGRESS_BLOCK is None:
+            sched[0] = (done // PROGRESS_BLOCK + 1) * PROGRESS_BLOCK
+        else:
+            while done >= sched[0]:
+                if sched[1] < 16:
+                    sched[1] = sched[1] + 1
+                    sched[0] = math.pow(2,sched[1])
+                else:
+                    sched[0] = sched[0] + math.pow(2,sched[1])
+        print(done)
+
+def print_stats(session, options):
+    #prints the send rate of the session at the end of a run
+    (packets, syscalls, seconds) = session.get_stats()
+    if options.quiet or packets == 0:
+        return
+    print("%d packets in %.1fs, %.1f packets/s, %.3f syscalls/packet" % (packets, seconds, packets / max(seconds, 0.001), syscalls / packets))
+
+def fork_workers(options, start, total):
+    #splits the test cases start to total into ranges, each run by a forked
+    #process. the children return their (first, stop) range, the parent
+    #merges their output and exits. lines holding a bare number are the
+    #progress of a child, they are summed up.
+    if start > 0:
+        base = 0
+    else:
+        base = 1
+    count = total - start
+    workers = {}
+    progress = [ 0 ] * options.workers
+    for k in range(options.workers):
+        first = start + count * k // options.workers
+        stop = start + count * (k + 1) // options.workers
+        child = fork_range(options, "w%d" % k, list(workers))
+        if child is None:
+            return (first, stop)
+        workers[child[1]] = {   "index"     :   k,
+                                "pid"       :   child[0],
+                                "first"     :   first + base,
+                                "buf"       :   b""
+                                }
+    sched = [ 1, 0 ]
+    failed = False
+    while workers:
+        try:
+            (ready, _, _) = select.select(list(workers), [], [])
+        except KeyboardInterrupt:
+            #the children got it as well and shut down on their own
+            continue
+        for r in ready:
+            w = workers[r]
+            (lines, w["buf"], eof) = read_lines(r, w["buf"])
+            for line in lines:
+                if line.strip().isdigit():
+                    progress[w["index"]] = int(line) - w["first"] + 1
+                    print_progress(sum(progress) + start + base - 1, sched)
+                else:
+                    print("[%d] %s" % (w["index"], line))
+            if eof:
+                os.close(r)
+                (_, status) = os.waitpid(w["pid"], 0)
+                if status != 0:
+                    failed = True
+                del workers[r]
+    sys.exit(1 if failed else 0)
+
+def parse_address(addr):
+    (host, _, port) = addr.rpartition(":")
+    return (host, int(port))
+
+def run_worker(options, start, total):
+    #takes ranges of test cases from a coordinator and runs each in a
+    #forked process, see coordinate(). the children return their
+    #(first, stop) range. the parent reports their progress and output and
+    #exits when the coordinator is done.
+    global PROGRESS_BLOCK
+    if start > 0:
+        base = 0
+    else:
+        base = 1
+    try:
+        s = socket.create_connection(parse_address(options.worker))
+    except Exception as e:
+        print("Cant connect to coordinator %s: %s" % (options.worker, str(e)))
+        sys.exit(1)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    f = s.makefile("rb")
+    s.sendall(("hello %d %d\n" % (start, total)).encode(CODEC))
+    while True:
+        cmd = f.readline().decode(CODEC).split()
+        if not cmd:
+            print("Lost connection to coordinator")
+            sys.exit(1)
+        if cmd[0] == "done":
+            sys.exit(0)
+        if cmd[0] != "range":
+            print("Coordinator: %s" % " ".join(cmd[1:]))
+            sys.exit(1)
+        (first, stop) = (int(cmd[1]), int(cmd[2]))
+        if not options.quiet:
+            print("running test cases %d to %d" % (first + base, stop + base - 1))
+        child = fork_range(options, "r%d" % first, [ s.fileno() ])
+        if child is None:
+            PROGRESS_BLOCK = WORKER_PROGRESS
+            return (first, stop)
+        (pid, r) = child
+        buf = b""
+        begin = time.time()
+        eof = False
+        while not eof:
+            try:
+                (lines, buf, eof) = read_lines(r, buf)
+            except KeyboardInterrupt:
+                continue
+            for line in lines:
+                if line.strip().isdigit():
+                    done = int(line) - first - base + 1
+                    s.sendall(("progress %d %.1f\n" % (done, done / max(time.time() - begin, 0.001))).encode(CODEC))
+                else:
+                    s.sendall(("line %s\n" % line).encode(CODEC))
+        os.close(r)
+        (_, status) = os.waitpid(pid, 0)
+        done = stop - first
+        s.sendall(("%s %d %.1f\n" % ("finished" if status == 0 else "failed", done, done / max(time.time() - begin, 0.001))).encode(CODEC))
+
 def get_session(options):
     if options.out_type == "eth":
         if os.geteuid() != 0:
@@ -1308,7 +3118,7 @@ def get_session(options):
         if options.server:
             parser.error("option -s only valid for udp/tcp/tls/sctp")
         try:
-            s = dizz_session(options.out_type, interface=options.out_dest, timeout=options.wait_recv)
+            s = dizz_session(options.out_type, interface=options.out_dest, timeout=options.wait_recv, mmsg=options.mmsg)
         except Exception as e:
             if DEBUG:
                 traceback.print_exc()
@@ -1374,7 +3184,7 @@ def get_session(options):
                 dport = None
             else:
                 dport = int(ports[1])
-            s = dizz_session(options.out_type, dest=options.out_dest, src=options.bind_addr, sport=sport, dport=dport, timeout=options.wait_recv, client_cert=options.client_cert, client_key=options.client_key, server_side=options.server)
+            s = dizz_session(options.out_type, dest=options.out_dest, src=options.bind_addr, sport=sport, dport=dport, timeout=options.wait_recv, client_cert=options.client_cert, client_key=options.client_key, server_side=options.server, mmsg=options.mmsg)
         except Exception as e:
             if DEBUG:
                 traceback.print_exc()
@@ -1430,6 +3240,268 @@ def read(session, options, rlen=None, interaction=None):
         sys.exit(1)
     return (d, reconnect)
 
+def print_plan(d, indent=""):
+    print("%s%-32s %-5s %14s %14s %20s" % (indent, "field", "mode", "values", "mutations", "mutations (-R)"))
+    for (name, mode, values, mutations, rmutations) in d.get_plan():
+        print("%s%-32s %-5s %14d %14d %20d" % (indent, name[:32], mode, values, mutations, rmutations))
+    print("%s%-32s %-5s %14s %14d %20d" % (indent, "total", "", "", d.get_mutation_count(False), d.get_mutation_count(True)))
+
+def plan(filename, options):
+    l = dizz_library()
+    if filename.endswith(".act"):
+        i = interaction(l)
+        i.load(filename)
+        for j in range(len(i.objects)):
+            print("step %d: %s (%s)" % (j, i.objects[j]["name"], i.objects[j]["dizz"].filename))
+            print_plan(i.objects[j]["dizz"], "    ")
+        count = i.get_test_count(options.recurse)
+    else:
+        d = dizz(l)
+        d.load(filename)
+        print_plan(d)
+        count = d.get_mutation_count(options.recurse) + 1
+        if options.cover:
+            print("%d test cases cover all %d-way combinations" % (len(d.get_cover(options.cover, options.cover_values)), options.cover))
+    print("%d test cases%s" % (count, " (recursive mode)" if options.recurse else ""))
+    if options.wait_send > 0:
+        secs = int(count * options.wait_send)
+        print("%d:%02d:%02d with %.3f seconds between test cases" % (secs // 3600, secs // 60 % 60, secs % 60, options.wait_send))
+
+def export(filename, options):
+    #renders the test cases of a dizz file into a corpus file, see
+    #tools.corpuswriter. the records get the test case number -N takes and
+    #the index of the current field.
+    l = dizz_library()
+    d = dizz(l)
+    d.load(filename)
+    meta = {    "file"      :   os.path.abspath(filename),
+                "version"   :   VERSION,
+                "recurse"   :   options.recurse,
+                "fields"    :   [ i._name for i in d.objects ]
+                }
+    index = int(options.start_at)
+    run = d.seek(index, options.recurse)
+    w = tools.corpuswriter(options.export, options.compress, options.block << 10, meta)
+    sched = [ 1, 0 ]
+    try:
+        while run:
+            d.operate()
+            w.write(d.generate(), index + 1, -1 if d.cur_obj is None else d.cur_obj)
+            run = d.mutate(options.recurse)
+            index += 1
+            if options.verbose == 0:
+                print_progress(w.count, sched)
+    finally:
+        w.close()
+    if not options.quiet:
+        print("%d test cases (%d bytes) written to %s" % (w.count, w.size, options.export))
+
+def get_records(corpus, options):
+    #the records selected with --records FIRST:STOP
+    (first, _, stop) = (options.records or "").partition(":")
+    first = int(first) if first else 0
+    stop = min(int(stop), len(corpus)) if stop else len(corpus)
+    return (first, max(first, stop))
+
+def replay(filename, options):
+    #sends the packets of a corpus file written with --export, straight out
+    #of the mmap'ed file
+    corpus = tools.corpusreader(filename)
+    (start, total) = get_records(corpus, options)
+    (first, stop) = (start, total)
+    if options.worker:
+        (first, stop) = run_worker(options, start, total)
+    elif options.workers > 1:
+        (first, stop) = fork_workers(options, start, total)
+    #progress is printed like the main loop does
+    if start > 0:
+        base = 0
+    else:
+        base = 1
+    session = get_session(options)
+    session.open()
+    baseline = b""
+    try:
+        if options.baseline:
+            (_, field, o) = corpus[0]
+            if field != -1:
+                raise dizz_runtimeException("the first record of %s is no default packet" % filename)
+            if options.verbose > 0:
+                print("Performing baseline request")
+            session.send_many([ o ])
+            (baseline, _) = read(session, options)
+        sched = [ 1, 0 ]
+        if not options.answer and options.wait_send == 0 and options.verbose == 0 and not options.reconnect:
+            #no need to look at the packets one by one. udp and eth skip a
+            #packet which cant be sent and go on with the rest, the other
+            #sessions get one packet per send_many, so a failing send does
+            #not drop the rest of the chunk.
+            batched = session.session_type == "udp" or session.session_type == "eth"
+            for chunk in range(first, stop, 4096):
+                packets = [ o for (_, _, o) in corpus.records(chunk, min(chunk + 4096, stop)) ]
+                for batch in ([ packets ] if batched else [ [ o ] for o in packets ]):
+                    try:
+                        session.send_many(batch)
+                    except Exception as e:
+                        if not options.quiet:
+                            print("Cant write output: %s" % str(e))
+                        if options.exit:
+                            sys.exit(1)
+                print_progress(min(chunk + 4096, stop) - 1 + base, sched)
+            return
+        fields = corpus.get_meta()["fields"]
+        index = first
+        for (num, field, o) in corpus.records(first, stop):
+            if options.verbose > 0:
+                print("%d: %s" % (num, fields[field] if field >= 0 else "default"))
+            if options.verbose > 2:
+                print(binascii.hexlify(o[:1024]))
+            try:
+                session.send_many([ o ])
+            except Exception as e:
+                if not options.quiet:
+                    print("Cant write output: %s" % str(e))
+                    if options.verbose > 2:
+                        traceback.print_exc()
+                if options.exit:
+                    sys.exit(1)
+            if options.answer:
+                (r, reconnect) = read(session, options)
+                if reconnect:
+                    session.close()
+                    session.open()
+                if options.baseline and r != baseline:
+                    print("!!! Baseline missmatch !!!")
+                    if options.verbose > 0 and options.verbose < 3:
+                        if len(r) > 1024:
+                            r = r[:1024] + b"..."
+                        print("Received %s" % r)
+            if options.verbose == 0:
+                print_progress(index + base, sched)
+            index += 1
+            time.sleep(options.wait_send)
+            if options.reconnect:
+                session.close()
+                session.open()
+    finally:
+        if session.is_open:
+            session.close()
+        print_stats(session, options)
+
+def coordinate(filename, options):
+    #hands out ranges of test cases to workers (--worker) over tcp. a line
+    #based protocol:
+    #   worker: hello START TOTAL            coordinator: range FIRST STOP
+    #   worker: progress DONE PPS                         done
+    #   worker: line TEXT                                 error TEXT
+    #   worker: finished|failed DONE PPS
+    #the part of a range not reported done is handed out again if its
+    #worker goes away.
+    l = dizz_library()
+    if options.replay:
+        (start, total) = get_records(tools.corpusreader(filename), options)
+    elif filename.endswith(".act"):
+        i = interaction(l)
+        i.load(filename)
+        start = 0
+        total = i.get_test_count(options.recurse)
+    else:
+        d = dizz(l)
+        d.load(filename)
+        start = int(options.start_at)
+        total = d.get_mutation_count(options.recurse) + 1
+    if start > 0:
+        base = 0
+    else:
+        base = 1
+    ranges = [ (j, min(j + options.chunk, total)) for j in range(start, total, options.chunk) ]
+    pending = len(ranges)
+    completed = 0
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(parse_address(options.coordinator))
+    listener.listen(16)
+    if not options.quiet:
+        print("%d test cases in %d ranges, waiting for workers on %s" % (total - start, len(ranges), options.coordinator))
+    workers = {}
+    sched = [ 1, 0 ]
+    status = 0
+    while pending > 0:
+        for w in workers.values():
+            if w["hello"] and w["range"] is None and ranges:
+                w["range"] = ranges.pop(0)
+                w["done"] = 0
+                w["sock"].sendall(("range %d %d\n" % w["range"]).encode(CODEC))
+        (ready, _, _) = select.select([ listener ] + list(workers), [], [], 5)
+        for r in ready:
+            if r is listener:
+                (c, addr) = listener.accept()
+                c.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                workers[c] = {  "sock"  :   c,
+                                "name"  :   "%s:%d" % addr,
+                                "hello" :   False,
+                                "range" :   None,
+                                "done"  :   0,
+                                "pps"   :   0.0,
+                                "buf"   :   b""
+                                }
+                continue
+            w = workers[r]
+            try:
+                data = r.recv(65536)
+            except socket.error:
+                data = b""
+            lines = (w["buf"] + data).split(b"\n")
+            w["buf"] = lines.pop()
+            for line in lines:
+                cmd = line.decode(CODEC, "replace").split(" ", 1)
+                if cmd[0] == "hello":
+                    if [ int(j) for j in cmd[1].split() ] != [ start, total ]:
+                        r.sendall(("error test cases %d to %d expected\n" % (start, total)).encode(CODEC))
+                        data = b""
+                    else:
+                        w["hello"] = True
+                        if not options.quiet:
+                            print("[%s] connected" % w["name"])
+                elif cmd[0] == "progress" or cmd[0] == "finished" or cmd[0] == "failed":
+                    (done, pps) = cmd[1].split()
+                    w["done"] = int(done)
+                    w["pps"] = float(pps)
+                    if cmd[0] != "progress":
+                        if cmd[0] == "failed":
+                            print("[%s] failed on test cases %d to %d" % (w["name"], w["range"][0] + base, w["range"][1] + base - 1))
+                            status = 1
+                        completed += w["range"][1] - w["range"][0]
+                        w["range"] = None
+                        w["done"] = 0
+                        pending -= 1
+                    running = sum([ j["done"] for j in workers.values() ])
+                    print_progress(completed + running + start + base - 1, sched)
+                    if options.verbose > 0:
+                        print("%d/%d test cases, %d workers, %.1f packets/s" % (completed + running, total - start, len(workers), sum([ j["pps"] for j in workers.values() if not j["range"] is None ])))
+                elif cmd[0] == "line":
+                    print("[%s] %s" % (w["name"], cmd[1] if len(cmd) > 1 else ""))
+            if not data:
+                if not w["range"] is None:
+                    #hand out what is left of the range again
+                    left = (w["range"][0] + w["done"], w["range"][1])
+                    if not options.quiet:
+                        print("[%s] gone, handing out test cases %d to %d again" % (w["name"], left[0] + base, left[1] + base - 1))
+                    if left[0] < left[1]:
+                        ranges.insert(0, left)
+                    else:
+                        pending -= 1
+                    completed += w["done"]
+                elif not options.quiet:
+                    print("[%s] gone" % w["name"])
+                r.close()
+                del workers[r]
+    for r in workers:
+        r.sendall(b"done\n")
+        r.close()
+    listener.close()
+    sys.exit(status)
+
 if __name__ == '__main__':
     parser = OptionParser(usage="usage: %s [options] {dizzfile | ackfile}" % os.path.basename(sys.argv[0]), version=VERSION)
     parser.add_option("-v", help="Be verbose", dest="verbose", action="count", default=0)
@@ -1446,13 +3518,73 @@ if __name__ == '__main__':
     parser.add_option("-R", help="Use recursive mutation mode (a lot of mutations!)", dest="recurse", action="store_true", default=False)
     parser.add_option("-s", help="Run in server side mode (accept connections)", dest="server", action="store_true", default=False)
     parser.add_option("-S", type="float", help="Start at the given step", dest="start_at", default=0)
+    parser.add_option("-N", type="int", help="Only (re)generate the test case with the given number", dest="regenerate", default=None)
     parser.add_option("-x", help="Exit on error", dest="exit", action="store_true", default=False)
     parser.add_option("-a", help="Read targets answer when running in non-interactive mode", dest="answer", action="store_true", default=False)
     parser.add_option("-q", help="Don't output any status messages", dest="quiet", action="store_true", default=False)
     parser.add_option("-B", help="Perform baseline request matching in non-interactive mode (implies -a)", dest="baseline", action="store_true", default=False)
+    parser.add_option("-n", "--batch", type="int", help="Generate and send the given number of packets at once (needs numpy, not with -a)", metavar="NUM", dest="batch", default=None)
+    parser.add_option("-M", "--mmsg", help="Queue the packets and send them with sendmmsg on a connected socket, runs of packets of the same length as one UDP GSO message (udp and eth output on Linux, for -n, --replay and with -w 0)", dest="mmsg", action="store_true", default=False)
+    parser.add_option("-C", "--compile", help="Generate packets with a builder compiled for the layout of the dizz file", dest="compile", action="store_true", default=False)
+    parser.add_option("--selftest", help="Check compiled builders and incremental checksums against the full computation (implies -C)", dest="selftest", action="store_true", default=False)
+    parser.add_option("-j", "--workers", type="int", help="Split the test cases across the given number of processes, each with its own session (file output goes to DEST-wN)", metavar="NUM", dest="workers", default=1)
+    parser.add_option("--coordinator", type="string", help="Hand out the test cases to workers connecting to the given address", metavar="HOST:PORT", dest="coordinator", default=None)
+    parser.add_option("--worker", type="string", help="Run the test cases handed out by the coordinator at the given address", metavar="HOST:PORT", dest="worker", default=None)
+    parser.add_option("--chunk", type="int", help="Number of test cases handed out to a worker at once (default 10000)", metavar="NUM", dest="chunk", default=10000)
+    parser.add_option("--sample", type="int", help="Send the given number of test cases drawn at random from all test cases of a dizz file", metavar="NUM", dest="sample", default=None)
+    parser.add_option("--stratify", help="Draw the same number of test cases for every field with --sample", dest="stratify", action="store_true", default=False)
+    parser.add_option("--seed", type="int", help="Select the test cases drawn with --sample (default 0)", metavar="NUM", dest="seed", default=0)
+    parser.add_option("--cover", type="int", help="Send test cases covering all combinations of the values of any T fields of a dizz file (T=2 for pairwise), instead of all test cases", metavar="T", dest="cover", default=None)
+    parser.add_option("--cover-values", type="int", help="Number of values per field used with --cover (default 32)", metavar="NUM", dest="cover_values", default=32)
+    parser.add_option("--dedup", type="int", help="Dont send packets of a dizz file which were sent before, remembered in a filter of the given size in MB (a few unique packets may get skipped)", metavar="MB", dest="dedup", default=None)
+    parser.add_option("--export", type="string", help="Write all test cases of a dizz file into the given corpus file and exit", metavar="FILE", dest="export", default=None)
+    parser.add_option("--compress", help="Compress the corpus file written with --export {zlib, lzma}", choices=["zlib", "lzma"], dest="compress", default=None)
+    parser.add_option("--block", type="int", help="Size of the compressed blocks of the corpus file in KB (default 1024)", metavar="KB", dest="block", default=1024)
+    parser.add_option("--replay", help="Send the packets of a corpus file written with --export instead of a dizz file", dest="replay", action="store_true", default=False)
+    parser.add_option("--records", type="string", help="Only send the records FIRST to STOP - 1 of the corpus file with --replay", metavar="FIRST:STOP", dest="records", default=None)
+    parser.add_option("--journal", type="string", help="Append the progress of the run to the given file", metavar="FILE", dest="journal", default=None)
+    parser.add_option("--journal-interval", type="float", help="Time between two checkpoints in the journal (default 1)", metavar="SEC", dest="journal_interval", default=1)
+    parser.add_option("--resume", type="string", help="Continue the run in the given journal (and keep on writing it)", metavar="FILE", dest="resume", default=None)
+    parser.add_option("--cache", help="Keep the loaded models in $XDG_CACHE_HOME/dizzy (~/.cache/dizzy) and use them while the files are unchanged", dest="cache", action="store_true", default=False)
+    parser.add_option("-P", "--plan", help="Print the number of mutations per field and step and exit", dest="plan", action="store_true", default=False)
     (options, args) = parser.parse_args()
     if len(args) != 1:
         parser.error("incorrect number of arguments")
+    CACHE = options.cache
+
+    if options.plan:
+        try:
+            plan(args[0], options)
+        except Exception as e:
+            if options.verbose > 2:
+                traceback.print_exc()
+            parser.error("invalid argument: %s: %s" % (args[0], str(e)))
+        sys.exit(0)
+
+    if options.export:
+        if args[0].endswith(".act"):
+            parser.error("option --export only valid for dizz files")
+        if options.block < 1:
+            parser.error("option --block needs at least 1 KB")
+        try:
+            export(args[0], options)
+        except KeyboardInterrupt:
+            sys.exit(1)
+        except Exception as e:
+            if options.verbose > 2:
+                traceback.print_exc()
+            parser.error("cant export %s: %s" % (args[0], str(e)))
+        sys.exit(0)
+
+    if options.coordinator:
+        try:
+            coordinate(args[0], options)
+        except KeyboardInterrupt:
+            sys.exit(1)
+        except Exception as e:
+            if options.verbose > 2:
+                traceback.print_exc()
+            parser.error("cant coordinate %s: %s" % (args[0], str(e)))
 
     if options.baseline and not options.answer:
         options.answer = True
@@ -1468,9 +3600,109 @@ if __name__ == '__main__':
         DEBUG2=True
     if options.verbose > 4:
         DEBUG3=True
+    if options.compile or options.selftest:
+        COMPILE=True
+    if options.selftest:
+        SELFTEST=True
         
     session = get_session(options)
-    
+
+    if options.batch:
+        if not numpy_present:
+            parser.error("option -n needs numpy")
+        if options.answer or options.reconnect:
+            parser.error("option -n cannot be used with -a, -B, -r or file output")
+        if args[0].endswith(".act"):
+            parser.error("option -n only valid for dizz files")
+
+    if options.mmsg:
+        if options.out_type != "udp" and options.out_type != "eth" or options.server:
+            parser.error("option -M only valid for udp and eth output without -s")
+        if sendmmsg is None:
+            parser.error("option -M needs sendmmsg, which is not available on %s" % PLATFORM)
+
+    if options.workers > 1 or options.worker:
+        if options.out_type == "stdout" or options.out_type == "stdout-hex" or options.server:
+            parser.error("options -j and --worker cannot be used with stdout output or -s")
+        if args[0].endswith(".act") and options.start_at:
+            parser.error("options -j and --worker cannot be used with -S for act files")
+        if options.workers > 1 and options.worker:
+            parser.error("option -j cannot be used with --worker")
+        if options.test or options.regenerate:
+            options.workers = 1
+            options.worker = None
+
+    if options.sample or options.cover:
+        if args[0].endswith(".act"):
+            parser.error("options --sample and --cover only valid for dizz files")
+        if options.batch or options.start_at or options.test or options.regenerate:
+            parser.error("options --sample and --cover cannot be used with -n, -S, -t or -N")
+        if options.workers > 1 or options.worker or options.journal or options.resume:
+            parser.error("options --sample and --cover cannot be used with -j, --worker, --journal or --resume")
+        if options.sample and options.cover:
+            parser.error("option --sample cannot be used with --cover")
+        if options.cover and (options.recurse or options.cover < 1 or options.cover_values < 3):
+            parser.error("option --cover needs T > 0, --cover-values > 2 and cannot be used with -R")
+
+    if options.replay:
+        if options.test or options.regenerate or options.start_at or options.batch or options.sample or options.cover:
+            parser.error("option --replay cannot be used with -t, -N, -S, -n, --sample or --cover")
+        if options.journal or options.resume or options.dedup:
+            parser.error("option --replay cannot be used with --journal, --resume or --dedup")
+        try:
+            replay(args[0], options)
+        except KeyboardInterrupt:
+            if not options.quiet:
+                print("closing session...")
+        except Exception as e:
+            print(e)
+            if options.verbose > 1:
+                traceback.print_exc()
+            sys.exit(1)
+        sys.exit(0)
+
+    if options.dedup and args[0].endswith(".act"):
+        parser.error("option --dedup only valid for dizz files")
+
+    resume = None
+    journal = None
+    dedup = None
+    if options.journal or options.resume:
+        if options.test or options.regenerate:
+            parser.error("options --journal and --resume cannot be used with -t or -N")
+        if options.workers > 1 or options.worker:
+            parser.error("options --journal and --resume cannot be used with -j or --worker")
+        if args[0].endswith(".act") and options.start_at:
+            parser.error("options --journal and --resume cannot be used with -S for act files")
+    if options.resume:
+        try:
+            (begin, checkpoint, anomalies, finished) = dizz_journal.read(options.resume)
+        except Exception as e:
+            parser.error("cant resume from %s: %s" % (options.resume, str(e)))
+        if begin["file"] != os.path.abspath(args[0]) or begin["recurse"] != options.recurse:
+            parser.error("journal %s is for %s%s" % (options.resume, begin["file"], " (recursive mode)" if begin["recurse"] else ""))
+        if finished:
+            if not options.quiet:
+                print("run in %s is finished" % options.resume)
+            sys.exit(0)
+        if checkpoint is None:
+            resume = begin
+        else:
+            resume = checkpoint
+        if not options.quiet:
+            print("resuming at test case %d" % resume["num"])
+            if resume["session"] != "%s %s %s" % (options.out_type, options.out_dest, options.out_extra):
+                print("journal was written with output %s" % resume["session"])
+            for a in anomalies:
+                print("%d: %s" % (a["num"], a["what"]))
+        if not options.journal:
+            options.journal = options.resume
+    if options.journal:
+        try:
+            journal = dizz_journal(options.journal, options.journal_interval)
+        except Exception as e:
+            parser.error("cant open journal %s: %s" % (options.journal, str(e)))
+
     l = dizz_library()
     dot = args[0].rfind(".")
     try:
@@ -1482,16 +3714,48 @@ if __name__ == '__main__':
                 if DEBUG:
                     traceback.print_exc()
                 parser.error("invalid argument: %s: %s" % (args[0], str(e)))
+            num = 1
+            count = None
+            if options.regenerate:
+                if not i.seek(options.regenerate - 1, options.recurse):
+                    sys.exit(0)
+                num = options.regenerate
+            if options.workers > 1 or options.worker:
+                if options.worker:
+                    (first, stop) = run_worker(options, 0, i.get_test_count(options.recurse))
+                else:
+                    (first, stop) = fork_workers(options, 0, i.get_test_count(options.recurse))
+                session = get_session(options)
+                count = stop - first
+                if i.has_random():
+                    run = i.skip(first, options.recurse)
+                else:
+                    run = i.seek(first, options.recurse)
+                if not run or count == 0:
+                    sys.exit(0)
+                num = first + 1
+            if not resume is None:
+                if not i.seek(resume["index"], options.recurse):
+                    sys.exit(0)
+                num = resume["num"]
+                if "random" in resume:
+                    random.setstate(resume["random"])
+            if not journal is None:
+                journal.begin(os.path.abspath(args[0]), options, num, num - 1)
             session.open()
             d = None
             done = False
-            num = 1
-            nxt = 1
-            seq = 0
+            sched = [ 1, 0 ]
             while not done:
+                #a test case cut off by a lost connection is sent once
+                #more from its first packet on the new connection
+                state = i.snapshot()
+                rstate = random.getstate()
+                retried = False
                 in_sequence = True
                 while in_sequence and not done:
                     reconnect = False
+                    failed = False
                     (o, rlen, done) = i.generate(options.recurse, options.test)
                     if options.verbose > 0:
                         current = i.get_current(options.recurse)
@@ -1511,6 +3775,9 @@ if __name__ == '__main__':
                     try:
                         session.send(o)
                     except Exception as e:
+                        failed = True
+                        if not journal is None:
+                            journal.anomaly(num, "Cant write output: %s" % str(e))
                         if not options.quiet:
                             print("Cant write output: %s" % str(e))
                             if options.verbose > 2:
@@ -1518,25 +3785,38 @@ if __name__ == '__main__':
                         if options.exit:
                             sys.exit(1)
                     (d, reconnect) = read(session, options, rlen, i)
+                    if reconnect and not journal is None:
+                        journal.anomaly(num, "connection lost")
                     i.operate(d)
-                    if  options.reconnect or reconnect:
+                    if  options.reconnect or reconnect or (failed and not retried):
                         session.close()
                         session.open()
+                    if (failed or reconnect) and not retried and not options.test:
+                        if options.verbose > 0:
+                            print("%d: sending the test case again" % num)
+                        i.restore(state)
+                        random.setstate(rstate)
+                        retried = True
+                        done = False
+                        continue
                     if i.gen_obj == 0:
                         in_sequence = False
                     if reconnect:
                         i.gen_obj = 0
-                if options.test:
+                if options.test or options.regenerate:
                     break
-                if num >= nxt and options.verbose == 0:
-                    if seq < 16:
-                        seq = seq + 1
-                        nxt = math.pow(2,seq)
-                    else:
-                        nxt = nxt + math.pow(2,seq)                
-                    print(num)
+                if not count is None:
+                    count -= 1
+                    if count == 0:
+                        break
+                if options.verbose == 0:
+                    print_progress(num, sched)
                 num = num + 1
+                if not journal is None:
+                    journal.checkpoint(num, i.cur_obj)
                 time.sleep(options.wait_send)
+            if done and not journal is None:
+                journal.finish(num)
         else:
             d = dizz(l)
             try:
@@ -1545,30 +3825,118 @@ if __name__ == '__main__':
                 if options.verbose > 2:
                     traceback.print_exc()
                 parser.error("invalid argument: %s: %s" % (args[0], str(e)))
+            if options.sample and not d.can_jump():
+                parser.error("option --sample cannot be used with %s: its fill or grow fields depend on the packets before, so each test case would be walked to" % args[0])
             run = True
             num = 1
-            nxt = 1
-            seq = 0
+            sched = [ 1, 0 ]
             start = int(options.start_at)
+            first = start
+            count = None
             baseline = b""
+            if options.workers > 1 or options.worker:
+                if options.worker:
+                    (first, stop) = run_worker(options, start, d.get_mutation_count(options.recurse) + 1)
+                else:
+                    (first, stop) = fork_workers(options, start, d.get_mutation_count(options.recurse) + 1)
+                session = get_session(options)
+                count = stop - first
+                if count == 0:
+                    sys.exit(0)
             session.open()
             if options.baseline:
                 if options.verbose > 0:
                     print("Performing baseline request")
-                newd =  copy.deepcopy(d)
-                newd.operate()
-                o = newd.generate()
+                state = d.snapshot()
+                d.operate()
+                o = d.generate()
+                d.restore(state)
                 session.send(o)
                 (baseline, _) = read(session, options)
                 if options.verbose > 1:
                     print("Received baseline answer of length %d" % len(baseline))
-            if start > 0:
-                while start > 0 and run:
-                    run = d.mutate(options.recurse)
-                    start = start - 1
-                num = int(options.start_at)
+            if options.regenerate:
+                run = d.seek(options.regenerate - 1, options.recurse)
+                num = options.regenerate
+            elif start > 0:
+                run = d.seek(start, options.recurse)
+                num = start
+            if first > start:
+                #the random numbers of the test cases before must be used up
+                #to get the same rand fields as a single process
+                d.skip_random(first - start)
+                run = d.seek(first, options.recurse)
+                num += first - start
+            index = start
+            if not resume is None:
+                run = d.seek(resume["index"], options.recurse)
+                num = resume["num"]
+                index = resume["index"]
+                if "random" in resume:
+                    random.setstate(resume["random"])
+            if not journal is None:
+                journal.begin(os.path.abspath(args[0]), options, num, index)
+            if options.dedup:
+                if options.sample:
+                    expected = options.sample
+                else:
+                    expected = d.get_mutation_count(options.recurse) + 1
+                dedup = tools.bloomfilter(options.dedup << 20, expected)
+                if not options.quiet:
+                    print("skipping duplicate packets, %.2g%% of the unique ones may get skipped as well" % (dedup.error(expected) * 100))
+            picks = None
+            if options.sample:
+                #num is the test case number -N takes
+                picks = ((index + 1, index) for index in d.get_sample(options.sample, options.recurse, options.seed, options.stratify))
+            elif options.cover:
+                cover = d.get_cover(options.cover, options.cover_values)
+                if not options.quiet:
+                    print("%d test cases cover all %d-way combinations (%d test cases without, %d with -R)" % (len(cover), options.cover, d.get_mutation_count(False) + 1, d.get_mutation_count(True) + 1))
+                picks = enumerate(cover, 1)
+            if not picks is None:
+                sampled = 1
+                (num, pick) = next(picks, (num, None))
+                run = not pick is None
+                if run and options.cover:
+                    d.set_values(pick)
+                elif run:
+                    d.seek(pick, options.recurse)
             if not run:
                 sys.exit(0)
+            #packets are only queued if nobody waits for them
+            queue = options.mmsg and not options.answer and options.wait_send == 0
+            while run and options.batch and not options.test and not options.regenerate:
+                if count is None:
+                    (packets, lengths, rows, run) = d.generate_batch(options.batch, options.recurse)
+                else:
+                    (packets, lengths, rows, run) = d.generate_batch(min(options.batch, count), options.recurse)
+                    count -= rows
+                    if count == 0:
+                        run = False
+                sent = rows
+                if not dedup is None:
+                    keep = [ not dedup.add(packets[j, :lengths[j]].tobytes()) for j in range(rows) ]
+                    sent = sum(keep)
+                    if sent < rows:
+                        packets = packets[:rows][numpy.array(keep, dtype=bool)]
+                        lengths = lengths[:rows][numpy.array(keep, dtype=bool)]
+                try:
+                    session.send_batch(packets, lengths, sent)
+                except Exception as e:
+                    if not journal is None:
+                        journal.anomaly(num, "Cant write output: %s" % str(e))
+                    if not options.quiet:
+                        print("Cant write output: %s" % str(e))
+                        if options.verbose > 2:
+                            traceback.print_exc()
+                    if options.exit:
+                        sys.exit(1)
+                num = num + rows
+                if options.verbose == 0:
+                    print_progress(num - 1, sched)
+                if not journal is None:
+                    journal.checkpoint(num)
+                time.sleep(options.wait_send * sent)
             while run:
                 d.operate()
                 o = d.generate()
@@ -1579,49 +3947,87 @@ if __name__ == '__main__':
                 if options.verbose > 2:
                     print(binascii.hexlify(o[:1024]))
                     #print str_to_bin(o)
-                try:
-                    session.send(o)
-                except Exception as e:
-                    if not options.quiet:
-                        print("Cant write output: %s" % str(e))
-                        if options.verbose > 2:
-                            traceback.print_exc()
-                    if options.exit:
-                        sys.exit(1)
-                if options.answer:
-                    (r, reconnect) = read(session, options)
-                    if reconnect:
-                        session.close()
-                        session.open()
-                    if options.baseline:
-                        if r != baseline:
-                            print("!!! Baseline missmatch !!!")
-                            if options.verbose > 0 and options.verbose < 3:
-                                if len(r) > 1024:
-                                    r = r[:1024] + b"..."
-                                print("Received %s" % r)
-                if options.test:
+                #test cases sent before are skipped
+                duplicate = not dedup is None and dedup.add(o)
+                if not duplicate:
+                    try:
+                        if queue:
+                            session.queue(o)
+                        else:
+                            session.send(o)
+                    except Exception as e:
+                        if not journal is None:
+                            journal.anomaly(num, "Cant write output: %s" % str(e))
+                        if not options.quiet:
+                            print("Cant write output: %s" % str(e))
+                            if options.verbose > 2:
+                                traceback.print_exc()
+                        if options.exit:
+                            sys.exit(1)
+                    if options.answer:
+                        (r, reconnect) = read(session, options)
+                        if reconnect:
+                            if not journal is None:
+                                journal.anomaly(num, "connection lost")
+                            session.close()
+                            session.open()
+                        if options.baseline:
+                            if r != baseline:
+                                if not journal is None:
+                                    journal.anomaly(num, "baseline missmatch")
+                                print("!!! Baseline missmatch !!!")
+                                if options.verbose > 0 and options.verbose < 3:
+                                    if len(r) > 1024:
+                                        r = r[:1024] + b"..."
+                                    print("Received %s" % r)
+                if options.test or options.regenerate:
                     break
-                run = d.mutate(options.recurse)
-                if num >= nxt and options.verbose == 0:
-                    if seq < 16:
-                        seq = seq + 1
-                        nxt = math.pow(2,seq)
-                    else:
-                        nxt = nxt + math.pow(2,seq)                
-                    print(num)
-                num = num + 1
-                time.sleep(options.wait_send)
+                if not count is None:
+                    count -= 1
+                    if count == 0:
+                        break
+                if picks is None:
+                    run = d.mutate(options.recurse)
+                    done = num
+                else:
+                    (index, pick) = next(picks, (num, None))
+                    run = not pick is None
+                    if run and options.cover:
+                        d.set_values(pick)
+                    elif run:
+                        d.seek(pick, options.recurse)
+                    done = sampled
+                if options.verbose == 0:
+                    print_progress(done, sched)
+                if picks is None:
+                    num = num + 1
+                else:
+                    sampled = sampled + 1
+                    num = index
+                if not journal is None:
+                    journal.checkpoint(num)
+                if not duplicate:
+                    time.sleep(options.wait_send)
                 if options.reconnect:
                     session.close()
                     session.open()
+            session.flush()
+            if not journal is None:
+                journal.finish(num)
     except KeyboardInterrupt:
         if session.is_open:
             if not options.quiet:
                 print("closing session...")
             session.close()
+        if not journal is None:
+            journal.close()
     except Exception as e:
         print(e)
         if options.verbose > 1:
             traceback.print_exc()
+        if not journal is None:
+            journal.close()
+    if not dedup is None and not options.quiet:
+        print("%d duplicate packets skipped" % dedup.duplicates)
+    print_stats(session, options)
     sys.exit(0)
@@ -0,0 +1,97 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import dizzy
+
+@pytest.fixture(autouse=True)
+def root_dir(monkeypatch):
+    #the library loads lib/std_string_lib.txt relative to the working
+    #directory, the model cache stays off unless a test turns it on
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setattr(dizzy, "CACHE", False)
+
+def load_dizz(tmp_path, name, source):
+    filename = str(tmp_path / (name + ".dizz"))
+    with open(filename, "w") as f:
+        f.write(source)
+    d = dizzy.dizz(dizzy.dizz_library())
+    d.load(filename)
+    return d
+
+def walk(d, recurse, limit=None):
+    #the packets of the sequential walk, like dizzy.py sends them
+    out = []
+    run = True
+    while run and (limit is None or len(out) < limit):
+        d.operate()
+        out += [ d.generate() ]
+        run = d.mutate(recurse)
+    return out
+
+def run_dizzy(*args, **kwargs):
+    #runs dizzy.py like on the command line, returns its output
+    p = subprocess.run([ sys.executable, os.path.join(ROOT, "dizzy.py"), "-q" ] + [ str(i) for i in args ], cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=kwargs.get("timeout", 300))
+    assert p.returncode == kwargs.get("returncode", 0), p.stderr.decode()
+    return p.stdout
+
+class udp_sink(object):
+    #collects the datagrams sent to a local port while the tests wait for
+    #dizzy.py, so the socket buffer doesnt overflow
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.packets = []
+        self.senders = []
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                (data, addr) = self.sock.recvfrom(1 << 16)
+                self.packets.append(data)
+                self.senders.append(addr)
+            except socket.timeout:
+                pass
+
+    def args(self):
+        return [ "-o", "udp", "-d", "127.0.0.1", "-e", "rand:%d" % self.port, "-w", "0", "-W", "0.001" ]
+
+    def close(self):
+        #waits for the datagrams on their way
+        while True:
+            count = len(self.packets)
+            time.sleep(0.3)
+            if count == len(self.packets):
+                break
+        self.running = False
+        self.thread.join()
+        self.sock.close()
+        return self.packets
+
+    def streams(self):
+        #the packets of each sending socket
+        streams = {}
+        for (addr, data) in zip(self.senders, self.packets):
+            streams.setdefault(addr, []).append(data)
+        return list(streams.values())
+
+@pytest.fixture
+def sink():
+    s = udp_sink()
+    yield s
+    if s.running:
+        s.close()
@@ -0,0 +1,43 @@
+import pytest
+
+import dizzy
+
+from conftest import load_dizz, walk
+
+numpy = pytest.importorskip("numpy")
+
+CSUM = '''name = "csum"
+objects = [
+    field("ver", 4, b"\\x04", none),
+    field("ihl", 4, b"\\x05", none),
+    field("len", 16, b"\\x00\\x00", none),
+    field("id", 8, b"\\x00", full),
+    field("proto", 8, b"\\x11", std),
+    field("csum", 16, b"\\x00\\x00", none),
+    field("src", 32, b"\\x0a\\x00\\x00\\x01", none),
+    link("dst", "id"),
+    field("pl", None, b"payload", std),
+    field("x", 12, b"\\x01\\x23", full),
+    field("csum2", 16, b"\\x00\\x00", none),
+    field("y", 4, b"\\x01", none),
+]
+functions = [
+    length("len", "ver", "y"),
+    csum("csum", "ver", "dst", "inet"),
+    csum("csum2", "ver", "y", "crc16"),
+]
+'''
+
+def batches(d, recurse, count, limit):
+    out = []
+    more = True
+    while more and len(out) < limit:
+        (packets, lengths, rows, more) = d.generate_batch(count, recurse)
+        out += [ packets[j, :lengths[j]].tobytes() for j in range(rows) ]
+    return out[:limit]
+
+@pytest.mark.parametrize("recurse", [ False, True ])
+@pytest.mark.parametrize("count", [ 7, 100, 1000 ])
+def test_batch_matches_walk(tmp_path, recurse, count):
+    packets = walk(load_dizz(tmp_path, "csum", CSUM), recurse, 6000)
+    assert batches(load_dizz(tmp_path, "csum", CSUM), recurse, count, 6000) == packets
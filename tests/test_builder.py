@@ -0,0 +1,72 @@
+import pytest
+
+import dizzy
+
+from conftest import load_dizz, walk
+
+MODELS = {
+    "bits" : '''name = "bits"
+objects = [
+    field("ver", 4, b"\\x04", none),
+    field("ihl", 4, b"\\x05", std),
+    field("tos", 8, b"\\x00", std),
+    field("len", 16, b"\\x00\\x00", none),
+    field("flags", 3, b"\\x02", full),
+    field("frag", 13, b"\\x00\\x00", std),
+    field("ttl", 8, b"\\x40", none),
+    field("csum", 16, b"\\x00\\x00", none),
+    field("odd", 5, b"\\x01", full),
+    field("odd2", 7, b"\\x01", std),
+    field("odd3", 4, b"\\x03", none),
+    field("payload", None, b"hello", std),
+    link("plink", "ttl"),
+    field("tail", 8, b"\\xff", none),
+]
+functions = [
+    length("len", "ver", "tail"),
+    csum("csum", "ver", "tail", "inet"),
+]
+''',
+    "padding" : '''name = "padding"
+objects = [
+    field("a", 8, b"\\x01", std),
+    field("len", 8, b"\\x00", none),
+    field("s", None, b"abc", std),
+    fill("f", "s", 4, b"\\x00"),
+    list("l", b"xx", "lib/std_string_lib.txt"),
+    padding("p", "a", "l", 32, b"\\xaa"),
+    field("b", 12, b"\\x0f\\xff", full),
+    field("c", 4, b"\\x01", none),
+    field("csum", 16, b"\\x00\\x00", none),
+    field("d", 16, b"\\x12\\x34", std),
+]
+functions = [
+    length("len", "s", "l"),
+    csum("csum", "a", "d", "crc16"),
+]
+''',
+    }
+
+def interpreted(d, recurse, limit):
+    #the packets as _get_obj_data() assembles them in one go
+    out = []
+    run = True
+    while run and len(out) < limit:
+        d.operate()
+        out += [ d._get_obj_data(0, len(d.objects) - 1) ]
+        run = d.mutate(recurse)
+    return out
+
+@pytest.mark.parametrize("model", sorted(MODELS))
+@pytest.mark.parametrize("recurse", [ False, True ])
+def test_compiled_builder(tmp_path, model, recurse):
+    packets = interpreted(load_dizz(tmp_path, model, MODELS[model]), recurse, 3000)
+    d = load_dizz(tmp_path, model, MODELS[model])
+    d.compiled = True
+    assert walk(d, recurse, 3000) == packets
+
+def test_selftest(tmp_path, monkeypatch):
+    monkeypatch.setattr(dizzy, "SELFTEST", True)
+    d = load_dizz(tmp_path, "bits", MODELS["bits"])
+    d.compiled = True
+    assert len(walk(d, False, 1000)) > 100
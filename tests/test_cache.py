@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+import dizzy
+
+from conftest import load_dizz, walk
+
+MODEL = '''name = "cached"
+objects = [
+    field("a", 8, b"\\x01", std),
+    field("len", 8, b"\\x00", none),
+    field("s", None, b"abc", std),
+    field("b", 6, b"\\x01", full),
+    field("csum", 16, b"\\x00\\x00", none),
+]
+functions = [
+    lambda_length("len", "s", "b", lambda x: x + 1),
+    csum("csum", "a", "b", "inet"),
+]
+'''
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    #counts the models read from their file instead of the cache
+    monkeypatch.setattr(dizzy, "CACHE", True)
+    monkeypatch.setattr(dizzy, "CACHE_DIR", str(tmp_path / "cache"))
+    loads = []
+    basic_dizz = dizzy.dizz.basic_dizz
+    def count(self, name, *args, **kwargs):
+        loads.append(name)
+        return basic_dizz(self, name, *args, **kwargs)
+    monkeypatch.setattr(dizzy.dizz, "basic_dizz", count)
+    return loads
+
+def reload(filename):
+    d = dizzy.dizz(dizzy.dizz_library())
+    d.load(filename)
+    return d
+
+def test_cache_hit(tmp_path, cache):
+    packets = walk(load_dizz(tmp_path, "cached", MODEL), False)
+    assert len(cache) == 5
+    assert os.listdir(str(tmp_path / "cache"))
+    assert not [ i for i in os.listdir(str(tmp_path)) if i.endswith(".cache") ]
+    d = reload(str(tmp_path / "cached.dizz"))
+    assert len(cache) == 5
+    assert walk(d, False) == packets
+
+def test_cache_off(tmp_path, cache, monkeypatch):
+    monkeypatch.setattr(dizzy, "CACHE", False)
+    load_dizz(tmp_path, "cached", MODEL)
+    reload(str(tmp_path / "cached.dizz"))
+    assert len(cache) == 10
+    assert not os.path.exists(str(tmp_path / "cache"))
+
+@pytest.mark.parametrize("change", [ "mtime", "content" ])
+def test_cache_changed(tmp_path, cache, change):
+    load_dizz(tmp_path, "cached", MODEL)
+    filename = str(tmp_path / "cached.dizz")
+    st = os.stat(filename)
+    if change == "mtime":
+        os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+    else:
+        #same size and mtime, only the content differs
+        with open(filename, "w") as f:
+            f.write(MODEL.replace('b"abc"', 'b"xyz"'))
+        os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns))
+    d = reload(filename)
+    assert len(cache) == 10
+    if change == "content":
+        assert d.objects[2].default == b"xyz"
+    reload(filename)
+    assert len(cache) == 10
+
+@pytest.mark.parametrize("owner", [ "uid", "mode" ])
+def test_cache_rejected(tmp_path, cache, monkeypatch, owner):
+    #cache files of other users or writable by them are not unpickled
+    load_dizz(tmp_path, "cached", MODEL)
+    filename = str(tmp_path / "cached.dizz")
+    if owner == "uid":
+        uid = os.getuid()
+        monkeypatch.setattr(os, "getuid", lambda: uid + 1)
+    else:
+        (_, path) = dizzy.cache_file(filename)
+        os.chmod(path, 0o620)
+    reload(filename)
+    assert len(cache) == 10
@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+import tools
+
+from conftest import load_dizz, run_dizzy, walk
+from test_seek import PLAIN
+
+@pytest.mark.parametrize("compression", [ None, "zlib", "lzma" ])
+def test_corpus_roundtrip(tmp_path, compression):
+    filename = str(tmp_path / "corpus")
+    rand = random.Random(3)
+    records = [ (i + 1, rand.randrange(-1, 5), bytes([ rand.randrange(256) for j in range(rand.randrange(40)) ])) for i in range(500) ]
+    w = tools.corpuswriter(filename, compression, 64, { "file" : "x.dizz", "recurse" : False })
+    for (num, field, data) in records:
+        w.write(data, num, field)
+    w.close()
+    r = tools.corpusreader(filename)
+    assert len(r) == len(records)
+    assert r.get_meta() == { "file" : "x.dizz", "recurse" : False }
+    assert [ (num, field, bytes(data)) for (num, field, data) in r.records() ] == records
+    assert [ (num, field, bytes(data)) for (num, field, data) in r.records(100, 150) ] == records[100:150]
+    (num, field, data) = r[321]
+    assert (num, field, bytes(data)) == records[321]
+    with pytest.raises(IndexError):
+        r[len(records)]
+
+def test_corpus_rejects_other_files(tmp_path):
+    filename = str(tmp_path / "other")
+    with open(filename, "wb") as f:
+        f.write(bytes(200))
+    with pytest.raises(ValueError):
+        tools.corpusreader(filename)
+
+@pytest.mark.parametrize("compression", [ None, "zlib" ])
+def test_export_and_replay(tmp_path, sink, compression):
+    packets = walk(load_dizz(tmp_path, "plain", PLAIN), False)
+    corpus = str(tmp_path / "corpus")
+    args = [ "--export", corpus, "--block", 1 ]
+    if compression:
+        args += [ "--compress", compression ]
+    run_dizzy(*args + [ str(tmp_path / "plain.dizz") ])
+    r = tools.corpusreader(corpus)
+    assert [ bytes(data) for (num, field, data) in r.records() ] == packets
+    assert [ num for (num, field, data) in r.records() ] == list(range(1, len(packets) + 1))
+    run_dizzy("--replay", "--records", "10:50", *sink.args() + [ corpus ])
+    assert sink.close() == packets[10:50]
@@ -0,0 +1,66 @@
+import itertools
+import random
+
+import pytest
+
+import tools
+
+from conftest import load_dizz
+
+@pytest.mark.parametrize("t", [ 1, 2, 3 ])
+def test_covering_array(t):
+    rand = random.Random(t)
+    for n in range(1, 9):
+        sizes = [ rand.randint(1, 5) for i in range(n) ]
+        rows = tools.covering_array(sizes, t)
+        for c in itertools.combinations(range(n), min(t, n)):
+            seen = set([ tuple([ r[j] for j in c ]) for r in rows ])
+            assert seen == set(itertools.product(*[ range(sizes[j]) for j in c ]))
+
+def test_covering_array_size():
+    #all pairs of 20 fields with 8 values, not much more rows than needed
+    rows = tools.covering_array([ 8 ] * 20, 2)
+    assert 64 <= len(rows) < 64 * 4
+
+COVER = '''name = "cover"
+objects = [
+    field("a", 8, b"\\x01", std),
+    field("len", 8, b"\\x00", none),
+    field("b", 3, b"\\x01", full),
+    field("c", 2, b"\\x00", full),
+    field("csum", 16, b"\\x00\\x00", none),
+    field("d", 8, b"\\x12", std),
+]
+functions = [
+    length("len", "b", "d"),
+    csum("csum", "a", "d", "inet"),
+]
+'''
+
+def test_cover_packets(tmp_path):
+    d = load_dizz(tmp_path, "cover", COVER)
+    d.operate()
+    default = d.generate()
+    cover = d.get_cover(2, 4)
+    (fields, counts) = d._get_fuzz_fields()
+    values = {}
+    rows = []
+    for pick in cover:
+        d.set_values(pick)
+        d.operate()
+        packet = d.generate()
+        row = dict([ (k, d.objects[k].cur) for k in fields ])
+        rows += [ row ]
+        for (k, cur) in pick:
+            values.setdefault(k, set()).add(cur)
+            assert row[k] == cur
+        #the fields not picked keep their default
+        for k in fields:
+            if not k in dict(pick):
+                assert row[k] == d.objects[k].default
+        if not pick:
+            assert packet == default
+    for (k, l) in itertools.combinations(fields, 2):
+        seen = set([ (row[k], row[l]) for row in rows ])
+        want = set(itertools.product(values[k] | { d.objects[k].default }, values[l] | { d.objects[l].default }))
+        assert seen == want
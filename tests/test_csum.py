@@ -0,0 +1,100 @@
+import itertools
+import random
+import struct
+
+import pytest
+
+import dizzy
+import tools
+
+from conftest import load_dizz, walk
+
+CHECK = b"123456789"
+
+VECTORS = [ ("crc32", CHECK, "cbf43926"),
+            ("crc32c", CHECK, "e3069283"),
+            ("sctp", CHECK, "839206e3"),
+            ("crc16", CHECK, "bb3d"),
+            ("crc16_modbus", CHECK, "374b"),
+            ("crc16_ccitt", CHECK, "29b1"),
+            ("crc16_xmodem", CHECK, "31c3"),
+            ("adler32", CHECK, "091e01de"),
+            ("fletcher16", b"abcde", "c8f0"),
+            ("fletcher32", b"abcde", "f04fc729"),
+            ("inet", bytes.fromhex("450000730000400040110000c0a80001c0a800c7"), "b861"),
+            ("inet", b"\x01", "fffe"),
+            ("inet_rfc", b"\x01", "feff"),
+            ]
+
+@pytest.mark.parametrize("cstype,data,out", VECTORS)
+def test_vectors(cstype, data, out):
+    check = dizzy.dizz.CHECKSUM[cstype]
+    assert check["call"](data).hex() == out
+    assert len(check["call"](data)) * 8 == check["length"]
+
+def ones_sum(data):
+    if len(data) % 2:
+        data += b"\x00"
+    s = sum(struct.unpack("!%dH" % (len(data) // 2), data))
+    while s >> 16:
+        s = (s & 0xFFFF) + (s >> 16)
+    return s
+
+def crc_bitwise(data, poly, crc):
+    for b in data:
+        crc ^= b
+        for j in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ poly
+            else:
+                crc >>= 1
+    return crc
+
+@pytest.mark.parametrize("width,poly", [ (32, 0x82F63B78), (16, 0xA001) ])
+def test_crc(width, poly):
+    #short messages, long ones and ones longer than the rows
+    rand = random.Random(width)
+    crc = tools.crc(width, poly)
+    for size in list(range(0, 100)) + [ 1000, 1500, 5000, 1024, 3000 ]:
+        data = bytes([ rand.randrange(256) for i in range(size) ])
+        for start in (0, (1 << width) - 1, rand.randrange(1 << width)):
+            assert crc(data, start) == crc_bitwise(data, poly, start), (size, start)
+            assert crc(memoryview(data), start) == crc_bitwise(data, poly, start), (size, start)
+
+def fletcher(data, bits):
+    #the definition, with the running sums
+    if bits == 32:
+        if len(data) % 2:
+            data += b"\x00"
+        data = [ data[i] | (data[i + 1] << 8) for i in range(0, len(data), 2) ]
+    mod = (1 << bits // 2) - 1
+    return struct.pack("!HH" if bits == 32 else "!BB", sum(itertools.accumulate(data)) % mod, sum(data) % mod)
+
+@pytest.mark.parametrize("bits", [ 16, 32 ])
+def test_fletcher(bits):
+    rand = random.Random(bits)
+    call = dizzy.dizz.CHECKSUM["fletcher%d" % bits]["call"]
+    for size in list(range(0, 70)) + [ 255, 256, 257, 1000, 65535, 65536, 70001 ]:
+        for data in (bytes([ rand.randrange(256) for i in range(size) ]), b"\xff" * size):
+            assert call(data) == fletcher(data, bits), size
+            assert call(memoryview(data)) == fletcher(data, bits), size
+
+def test_udp4():
+    ip = bytes.fromhex("4500001c000000004011000" "0c0a80001c0a800c7")
+    udp = bytes.fromhex("303900350008") + b"\x00\x00" + b"abc"
+    s = ones_sum(ip[12:20] + struct.pack("!HH", 17, len(udp)) + udp)
+    assert dizzy.dizz.CHECKSUM["udp4"]["call"](ip + udp) == struct.pack("!H", ~s & 0xFFFF)
+
+@pytest.mark.parametrize("cstype", [ "tcp4", "udp4", "tcp6", "udp6" ])
+@pytest.mark.parametrize("data", [ b"", b"\x45", b"\x4f" + bytes(39), bytes(20), bytes(39), b"\x4f" * 70000 ])
+def test_pseudo_header_fuzzed(cstype, data):
+    #fuzzed header values must not end the session
+    assert len(dizzy.dizz.CHECKSUM[cstype]["call"](data)) == 2
+
+@pytest.mark.parametrize("cstype", [ "inet", "inet_rfc" ])
+def test_update(tmp_path, cstype):
+    #the incremental update gives the same checksums as the full computation
+    source = 'name = "u"\nobjects = [\n    field("csum", 16, b"\\x00\\x00", none),\n    field("a", 8, b"\\x01", std),\n    field("b", 16, b"\\x12\\x34", full),\n    field("s", None, b"abc", std),\n]\nfunctions = [\n    csum("csum", "a", "s", "%s"),\n]\n' % cstype
+    d = load_dizz(tmp_path, "u", source)
+    for packet in walk(d, False, 5000):
+        assert packet[:2] == dizzy.dizz.CHECKSUM[cstype]["call"](packet[2:])
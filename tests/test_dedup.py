@@ -0,0 +1,37 @@
+import tools
+
+from conftest import load_dizz, run_dizzy, walk
+
+def test_bloomfilter():
+    bloom = tools.bloomfilter(1 << 12, 1000)
+    seen = sum([ bloom.add(b"packet %d" % i) for i in range(1000) ])
+    assert bloom.count + bloom.duplicates == 1000
+    #no false negatives
+    assert all([ bloom.add(b"packet %d" % i) for i in range(1000) ])
+    #the false positives stay near the predicted rate
+    bits = bytes(bloom.bits)
+    false = 0
+    for i in range(10000):
+        false += bloom.add(b"other %d" % i)
+        bloom.bits[:] = bits
+    assert seen < 1000 * bloom.error(1000) * 3 + 5
+    assert false < 10000 * bloom.error(1000) * 1.5 + 10
+
+DUPLICATES = '''name = "duplicates"
+objects = [
+    field("a", 8, b"\\x00", std),
+    field("b", 4, b"\\x00", full),
+    field("c", 8, b"\\xff", std),
+]
+functions = []
+'''
+
+def test_dedup(tmp_path, sink):
+    packets = walk(load_dizz(tmp_path, "duplicates", DUPLICATES), False)
+    unique = []
+    for i in packets:
+        if not i in unique:
+            unique += [ i ]
+    assert len(unique) < len(packets)
+    run_dizzy("--dedup", 1, *sink.args() + [ str(tmp_path / "duplicates.dizz") ])
+    assert sink.close() == unique
@@ -0,0 +1,80 @@
+import ast
+
+import pytest
+
+import dizzy
+
+from conftest import run_dizzy, udp_sink
+from test_seek import LAST, run_case
+
+RAND = '''name = "rand"
+objects = [
+    field("a", 8, b"\\x01", std),
+    rand("r", 16),
+    field("s", 12, b"\\x0a\\xbc", std),
+    field("b", 4, b"\\x00", full),
+]
+functions = []
+'''
+
+def write_models(tmp_path):
+    #no variable length fields, the longest strings of the library dont
+    #fit into a datagram
+    for (name, source) in (("rand", RAND), ("last", LAST)):
+        with open(str(tmp_path / (name + ".dizz")), "w") as f:
+            f.write(source)
+    with open(str(tmp_path / "steps.act"), "w") as f:
+        f.write('name = "steps"\nobjects = [\n    dizz("one", "%s"),\n    dizz("rand", "%s"),\n    dizz("three", "%s"),\n]\nfunctions = []\n' % (tmp_path / "last.dizz", tmp_path / "rand.dizz", tmp_path / "last.dizz"))
+
+def send(args):
+    sink = udp_sink()
+    try:
+        run_dizzy(*sink.args() + args)
+    finally:
+        packets = sink.close()
+    return packets
+
+@pytest.mark.parametrize("model", [ "rand.dizz", "steps.act" ])
+def test_resume(tmp_path, model):
+    #a run cut off after a checkpoint and resumed from the journal sends
+    #the same packets as the run that was never interrupted
+    write_models(tmp_path)
+    filename = str(tmp_path / model)
+    journal = str(tmp_path / "journal")
+    packets = send([ "--journal", journal, "--journal-interval", 0, filename ])
+    with open(journal) as f:
+        lines = f.readlines()
+    records = [ ast.literal_eval(i) for i in lines ]
+    assert records[0]["type"] == "start"
+    assert records[-1]["type"] == "done"
+    #the first packet of each test case
+    first = [ 0 ]
+    if model.endswith(".act"):
+        i = dizzy.interaction(dizzy.dizz_library())
+        i.load(filename)
+        done = False
+        while not done:
+            (out, done) = run_case(i, False)
+            first += [ first[-1] + len(out) ]
+    else:
+        first = list(range(len(packets) + 1))
+    assert records[-1]["num"] == len(first)
+    assert first[-1] == len(packets)
+    checkpoints = [ k for k in range(len(records)) if records[k]["type"] == "checkpoint" ]
+    for k in (checkpoints[0], checkpoints[len(checkpoints) // 3], checkpoints[-2]):
+        cut = str(tmp_path / "cut")
+        with open(cut, "w") as f:
+            #the last line is half written
+            f.writelines(lines[:k + 1] + [ lines[k + 1][:20] ])
+        (start, checkpoint, anomalies, done) = dizzy.dizz_journal.read(cut)
+        assert checkpoint == records[k] and not done
+        sent = send([ "--resume", cut, filename ])
+        assert sent == packets[first[records[k]["num"] - 1]:], k
+        assert dizzy.dizz_journal.read(cut)[3]
+
+def test_resume_finished(tmp_path):
+    write_models(tmp_path)
+    filename = str(tmp_path / "rand.dizz")
+    journal = str(tmp_path / "journal")
+    send([ "--journal", journal, filename ])
+    assert send([ "--resume", journal, filename ]) == []
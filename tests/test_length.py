@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from conftest import load_dizz
+from test_seek import PLAIN, STATEFUL
+from test_workers import FIXED
+
+NESTED = '''name = "nested"
+objects = [
+    field("outer", 16, b"\\x00\\x00", none),
+    field("s", None, b"ab", std),
+    field("inner", 8, b"\\x00", none),
+    list("l", b"xx", "lib/std_string_lib.txt"),
+    padding("p", "s", "l", 32, b"\\xaa"),
+    field("b", 5, b"\\x01", full),
+    padding("q", "outer", "b", 16, b"\\x00"),
+    field("t", None, b"tail", std),
+]
+functions = [
+    length("inner", "l", "p"),
+    length("outer", "s", "t"),
+]
+'''
+
+MODELS = {  "plain"     :   PLAIN,
+            "stateful"  :   STATEFUL % os.devnull,
+            "nested"    :   NESTED
+            }
+
+@pytest.mark.parametrize("model", sorted(MODELS))
+@pytest.mark.parametrize("recurse", [ False, True ])
+def test_range_length(tmp_path, model, recurse):
+    #the lengths from the prefix sums are the sums of the field lengths
+    d = load_dizz(tmp_path, model, MODELS[model])
+    count = len(d.objects)
+    run = True
+    packets = 0
+    while run and packets < 3000:
+        d.operate()
+        for start in range(count):
+            for end in range(start, count):
+                assert d._get_range_length(start, end) == d._get_obj_length(start, end), (packets, start, end)
+        run = d.mutate(recurse)
+        packets += 1
+
+def test_length_fields(tmp_path):
+    d = load_dizz(tmp_path, "nested", NESTED)
+    (outer, inner) = (d.objects[0], d.objects[2])
+    run = True
+    while run:
+        d.operate()
+        if d.cur_obj is None or d.cur_obj > 2:
+            #lengths too large for the field max it out
+            assert int.from_bytes(inner.cur, "big") == min(d._get_obj_length(3, 4) // 8, 0xff)
+            assert int.from_bytes(outer.cur, "big") == min(d._get_obj_length(1, 7) // 8, 0xffff)
+        run = d.mutate(False)
+
+@pytest.mark.parametrize("model", sorted(MODELS) + [ "fixed" ])
+@pytest.mark.parametrize("recurse", [ False, True ])
+def test_operate_changed(tmp_path, model, recurse):
+    #operate() only runs the functions reading a changed field, the
+    #packets are the same as with all of them run on each packet
+    source = FIXED if model == "fixed" else MODELS[model]
+    d = load_dizz(tmp_path, model, source)
+    full = load_dizz(tmp_path, model, source)
+    runs = []
+    run_step = d._run_step
+    def count(step, dry):
+        runs.append(step["order"])
+        return run_step(step, dry)
+    d._run_step = count
+    packets = 0
+    run = True
+    while run and packets < 3000:
+        d.operate()
+        full._touch()
+        full.operate()
+        assert d.generate() == full.generate(), packets
+        run = d.mutate(recurse)
+        assert full.mutate(recurse) == run
+        packets += 1
+    assert len(runs) < packets * len(d.functions)
@@ -0,0 +1,79 @@
+import pytest
+
+import dizzy
+import tools
+
+from conftest import load_dizz, walk
+
+def write_list(tmp_path, lines, name="list.txt"):
+    filename = str(tmp_path / name)
+    with open(filename, "wb") as f:
+        f.write(b"\n".join(lines) + b"\n")
+    return filename
+
+@pytest.mark.parametrize("ascii", [ True, False ])
+def test_listfile_matches_load_strings(tmp_path, monkeypatch, ascii):
+    #both loaders split at \n only and drop one \r in front of it
+    lines = [ b"a", b"b", b"a", b"", b"c\r", b"a\rb", b"\r", "\u00e4".encode("utf-8"), b"\\x41", b"A", b"b", b"d\r\r" ]
+    filename = write_list(tmp_path, lines)
+    lib = dizzy.dizz_library()
+    lib.load_strings(filename, "mem", ascii=ascii)
+    monkeypatch.setattr(dizzy, "LIST_MMAP", 0)
+    lib.load_strings(filename, "mmap", ascii=ascii)
+    assert isinstance(lib.lib["mmap"], tools.listfile)
+    assert [ lib.lib["mmap"][i] for i in range(len(lib.lib["mmap"])) ] == lib.lib["mem"]
+    assert len(lib.lib["mem"]) == len(set(lib.lib["mem"]))
+    if ascii:
+        assert lib.lib["mem"][1:-1] == [ "a", "b", "c", "a\rb", "\u00e4", "\\x41", "A", "d\r" ]
+    else:
+        #the escapes are undone on the bytes of the line, like before
+        assert lib.lib["mem"][1:-1] == [ b"a", b"b", b"c", b"a\rb", "\u00e4".encode("utf-8").decode("unicode_escape").encode("utf-8"), b"A", b"d\r" ]
+
+def test_listfile_reads_saved_index(tmp_path):
+    filename = write_list(tmp_path, [ b"line%d" % i for i in range(100) ] * 2)
+    first = tools.listfile(filename)
+    second = tools.listfile(filename)
+    assert len(first) == len(second) == 102
+    assert [ first[i] for i in range(len(first)) ] == [ second[i] for i in range(len(second)) ]
+    assert [ second.find(second[i].encode("utf-8")) for i in range(1, 101) ] == list(range(1, 101))
+
+@pytest.mark.parametrize("encoding", [ "utf-8", "utf-16-le" ])
+def test_listentries_get(tmp_path, monkeypatch, encoding):
+    filename = write_list(tmp_path, [ b"line%d" % i for i in range(1000) ] + [ "\u00e4".encode("utf-8") ])
+    entries = tools.listfile(filename).entries(encoding)
+    lines = []
+    get_line = tools.listfile._get_line
+    def count(self, offset, length):
+        lines.append(offset)
+        return get_line(self, offset, length)
+    monkeypatch.setattr(tools.listfile, "_get_line", count)
+    assert entries.get(b"") == 0
+    assert entries.get("line999".encode(encoding)) == 1000
+    assert entries.get("\u00e4".encode(encoding)) == 1001
+    assert entries.get(b"missing", -1) == -1
+    assert entries.get(b"\xff", -1) == -1
+    #the values are looked up in the index, not searched for
+    assert len(lines) <= 2
+    assert entries[len(entries) - 1] is None
+
+def test_list_walk_is_lazy(tmp_path, monkeypatch):
+    filename = write_list(tmp_path, [ b"line%06d" % i for i in range(5000) ])
+    source = 'name = "big"\nobjects = [\n    field("a", 8, b"\\x01", std),\n    list("l", b"dflt", "%s"),\n    field("b", 8, b"\\x01", std),\n]\nfunctions = []\n' % filename
+    packets = walk(load_dizz(tmp_path, "mem", source), False, 3100)
+    monkeypatch.setattr(dizzy, "LIST_MMAP", 0)
+    d = load_dizz(tmp_path, "big", source)
+    assert isinstance(d.library.lib[filename], tools.listfile)
+    lines = []
+    get_line = tools.listfile._get_line
+    def count(self, offset, length):
+        lines.append(offset)
+        return get_line(self, offset, length)
+    monkeypatch.setattr(tools.listfile, "_get_line", count)
+    assert walk(d, False, 50) == packets[:50]
+    d.seek(3000, False)
+    d.operate()
+    assert d.generate() == packets[3000]
+    d.mutate(False)
+    d.operate()
+    assert d.generate() == packets[3001]
+    assert len(lines) < 100
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+import dizzy
+
+from conftest import load_dizz, run_dizzy, walk
+from test_workers import FIXED
+
+pytestmark = pytest.mark.skipif(dizzy.sendmmsg is None, reason="no sendmmsg on %s" % dizzy.PLATFORM)
+
+def open_session(sink):
+    s = dizzy.dizz_session("udp", dest="127.0.0.1", src="", sport=None, dport=sink.port, mmsg=True)
+    s.open()
+    return s
+
+def test_send_mmsg(sink):
+    rand = random.Random(1)
+    packets = []
+    #runs of the same length go out as one gso message
+    for i in range(300):
+        size = rand.choice([ 0, 1, 100, 100, 100, 1400, 1400, 3000 ])
+        packets += [ bytes([ rand.randrange(256) for j in range(size) ]) ]
+    s = open_session(sink)
+    s.send_many(packets[:150])
+    for data in packets[150:]:
+        s.queue(data)
+    s.close()
+    assert sink.close() == packets
+    (count, syscalls, seconds) = s.get_stats()
+    assert count == len(packets)
+    assert syscalls < len(packets) // 4
+
+def test_send_mmsg_too_large(sink):
+    #a packet the kernel refuses is skipped, the others are sent
+    packets = [ b"a" * 10, b"b" * 70000, b"c" * 10 ]
+    s = open_session(sink)
+    s.send_many(packets)
+    s.close()
+    assert sink.close() == [ packets[0], packets[2] ]
+
+def test_mmsg_option(tmp_path, sink):
+    packets = walk(load_dizz(tmp_path, "fixed", FIXED), True)
+    run_dizzy("-M", "-R", *sink.args() + [ str(tmp_path / "fixed.dizz") ])
+    assert sink.close() == packets
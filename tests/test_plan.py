@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from conftest import load_dizz, run_dizzy, walk
+from test_seek import PLAIN, STATEFUL, load_act, run_case
+from test_workers import FIXED
+
+MODELS = {  "plain"     :   PLAIN,
+            "stateful"  :   STATEFUL % os.devnull,
+            "fixed"     :   FIXED
+            }
+
+def fields_walked(d):
+    #the field mutated for each packet of the walk after the first. the
+    #first mutation of a field shows the field not mutated before it as
+    #the current one, get_plan() counts a last packet like that on its own.
+    out = []
+    while d.mutate(False):
+        out += [ d.objects[d.cur_obj] ]
+    return [ out[k + 1]._name if out[k].fuzz == "none" and k + 1 < len(out) else out[k]._name for k in range(len(out)) ]
+
+@pytest.mark.parametrize("model", sorted(MODELS))
+def test_plan_matches_walk(tmp_path, model):
+    d = load_dizz(tmp_path, model, MODELS[model])
+    walked = fields_walked(load_dizz(tmp_path, model, MODELS[model]))
+    assert [ (name, mutations) for (name, mode, values, mutations, rmutations) in d.get_plan() ] == [ (name, walked.count(name)) for name in sorted(set(walked), key=walked.index) ]
+    assert d.get_mutation_count(False) == len(walked)
+    out = run_dizzy("-P", "-w", 0, str(tmp_path / (model + ".dizz"))).decode()
+    assert "%d test cases\n" % (len(walked) + 1) in out
+
+def test_plan_recursive(tmp_path):
+    d = load_dizz(tmp_path, "fixed", FIXED)
+    count = len(walk(load_dizz(tmp_path, "fixed", FIXED), True))
+    assert d.get_mutation_count(True) + 1 == count
+    assert sum([ i[4] for i in d.get_plan() ]) + 1 == count
+    out = run_dizzy("-P", "-R", "-w", 0, str(tmp_path / "fixed.dizz")).decode()
+    assert "%d test cases (recursive mode)\n" % count in out
+
+def test_plan_act(tmp_path):
+    i = load_act(tmp_path)
+    count = 0
+    done = False
+    while not done:
+        (out, done) = run_case(i, False)
+        count += 1
+    assert load_act(tmp_path).get_test_count(False) == count
+    out = run_dizzy("-P", "-w", 0, str(tmp_path / "steps.act")).decode()
+    assert "%d test cases\n" % count in out
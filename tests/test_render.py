@@ -0,0 +1,15 @@
+import pytest
+
+from conftest import load_dizz, walk
+from test_builder import MODELS, interpreted
+
+@pytest.mark.parametrize("model", sorted(MODELS))
+@pytest.mark.parametrize("recurse", [ False, True ])
+def test_incremental_render(tmp_path, model, recurse):
+    #only the segments with changed fields are rendered again, the
+    #packets stay the same as assembled in one go
+    packets = interpreted(load_dizz(tmp_path, model, MODELS[model]), recurse, 3000)
+    d = load_dizz(tmp_path, model, MODELS[model])
+    assert not d.compiled
+    assert walk(d, recurse, 3000) == packets
+    assert not d._segments is None
@@ -0,0 +1,47 @@
+import pytest
+
+import tools
+
+from conftest import load_dizz, walk
+from test_seek import PLAIN
+
+@pytest.mark.parametrize("size", [ 1, 2, 3, 17, 256, 1000, 4097 ])
+def test_permutation_is_bijection(size):
+    perm = tools.permutation(size, b"key")
+    assert len(perm) == size
+    assert sorted(perm) == list(range(size))
+    with pytest.raises(IndexError):
+        perm[size]
+
+def test_permutation_depends_on_key():
+    assert list(tools.permutation(1000, b"a")) != list(tools.permutation(1000, b"b"))
+    assert list(tools.permutation(1000, b"a")) == list(tools.permutation(1000, b"a"))
+
+@pytest.mark.parametrize("stratify", [ False, True ])
+def test_sample(tmp_path, stratify):
+    packets = walk(load_dizz(tmp_path, "plain", PLAIN), False)
+    d = load_dizz(tmp_path, "plain", PLAIN)
+    sample = list(d.get_sample(200, False, 1, stratify))
+    assert len(sample) == 200
+    assert len(set(sample)) == 200
+    assert all([ 0 <= k < len(packets) for k in sample ])
+    assert list(d.get_sample(200, False, 1, stratify)) == sample
+    assert list(d.get_sample(200, False, 2, stratify)) != sample
+    #the sampled test cases are the packets of the walk
+    for k in sample[:50]:
+        d.seek(k, False)
+        d.operate()
+        assert d.generate() == packets[k]
+    #asking for more than there is gives all test cases once
+    assert sorted(d.get_sample(len(packets) + 10, False, 1, stratify)) == list(range(len(packets)))
+
+def test_sample_stratified_covers_fields(tmp_path):
+    d = load_dizz(tmp_path, "plain", PLAIN)
+    #every field gets a test case before any gets a second one
+    fields = len(d.get_plan())
+    sample = list(d.get_sample(fields + 1, False, 0, True))
+    hit = set()
+    for k in sample:
+        d.seek(k, False)
+        hit.add(d.cur_obj)
+    assert len(hit) == fields + 1
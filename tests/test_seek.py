@@ -0,0 +1,125 @@
+import os
+import random
+
+import pytest
+
+import dizzy
+
+from conftest import load_dizz, walk
+
+PLAIN = '''name = "plain"
+objects = [
+    field("a", 8, b"\\x01", std),
+    field("len", 8, b"\\x00", none),
+    field("s", None, b"abc", std),
+    list("l", b"xx", "lib/std_string_lib.txt"),
+    padding("p", "a", "l", 32, b"\\xaa"),
+    field("b", 12, b"\\x0f\\xff", full),
+    field("c", 4, b"\\x01", none),
+    field("csum", 16, b"\\x00\\x00", none),
+    field("d", 16, b"\\x12\\x34", std),
+]
+functions = [
+    length("len", "s", "l"),
+    csum("csum", "a", "d", "inet"),
+]
+'''
+
+STATEFUL = '''name = "stateful"
+objects = [
+    field("a", 8, b"\\x01", std),
+    grow("g", 8, b"\\x41", std, b"\\x42", 24),
+    field("s", None, b"abc", std),
+    fill("f", "s", 4, b"\\x00"),
+    field("len", 8, b"\\x00", none),
+    field("b", 4, b"\\x01", full),
+    field("c", 4, b"\\x01", none),
+]
+functions = [
+    length("len", "a", "f"),
+    run_cmd("echo run >> %s"),
+]
+'''
+
+def check_seek(d, packets, recurse, indices):
+    for k in indices:
+        d.seek(k, recurse)
+        d.operate()
+        assert d.generate() == packets[k], k
+
+@pytest.mark.parametrize("recurse", [ False, True ])
+def test_seek_matches_walk(tmp_path, recurse):
+    packets = walk(load_dizz(tmp_path, "plain", PLAIN), recurse, 3000)
+    d = load_dizz(tmp_path, "plain", PLAIN)
+    rand = random.Random(1)
+    check_seek(d, packets, recurse, list(range(100)) + [ rand.randrange(len(packets)) for i in range(300) ])
+
+@pytest.mark.parametrize("recurse", [ False, True ])
+def test_seek_fill_and_grow(tmp_path, recurse):
+    runs = str(tmp_path / "runs")
+    source = STATEFUL % runs
+    packets = walk(load_dizz(tmp_path, "stateful", source), recurse, 1000)
+    os.remove(runs)
+    d = load_dizz(tmp_path, "stateful", source)
+    assert not d.can_jump()
+    rand = random.Random(2)
+    indices = list(range(30)) + [ rand.randrange(len(packets)) for i in range(30) ]
+    check_seek(d, packets, recurse, indices)
+    #only the operate() calls of the test itself run the command
+    with open(runs) as f:
+        assert len(f.readlines()) == len(indices)
+
+STEP = '''name = "step"
+objects = [
+    field("a", 3, b"\\x01", full),
+    field("s", None, b"ab", std),
+    field("e", 9, b"\\x01\\x01", std),
+    field("csum", 16, b"\\x00\\x00", none),
+    field("g", 6, b"\\x01", none),
+]
+functions = [
+    csum("csum", "a", "g", "inet"),
+]
+'''
+
+LAST = '''name = "last"
+objects = [
+    field("a", 2, b"\\x01", full),
+    field("b", 8, b"\\x01", none),
+    field("c", 3, b"\\x01", full),
+]
+functions = []
+'''
+
+def load_act(tmp_path):
+    for (name, source) in (("step", STEP), ("last", LAST)):
+        with open(str(tmp_path / (name + ".dizz")), "w") as f:
+            f.write(source)
+    filename = str(tmp_path / "steps.act")
+    with open(filename, "w") as f:
+        f.write('name = "steps"\nobjects = [\n    dizz("one", "%s"),\n    dizz("two", "%s"),\n    dizz("three", "%s"),\n]\nfunctions = []\n' % (tmp_path / "step.dizz", tmp_path / "step.dizz", tmp_path / "last.dizz"))
+    i = dizzy.interaction(dizzy.dizz_library())
+    i.load(filename)
+    return i
+
+def run_case(i, recurse):
+    #the packets of one test case, like the main loop sends them
+    out = []
+    while True:
+        (o, rlen, done) = i.generate(recurse)
+        out += [ o ]
+        if done or i.gen_obj == 0:
+            return (out, done)
+
+@pytest.mark.parametrize("recurse", [ False, True ])
+def test_act_seek_matches_walk(tmp_path, recurse):
+    i = load_act(tmp_path)
+    cases = []
+    done = False
+    while not done and len(cases) < 2000:
+        (out, done) = run_case(i, recurse)
+        cases += [ out ]
+    i = load_act(tmp_path)
+    for n in range(len(cases)):
+        assert i.seek(n, recurse)
+        assert run_case(i, recurse)[0] == cases[n], n
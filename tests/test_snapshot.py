@@ -0,0 +1,98 @@
+import os
+import random
+import socket
+import struct
+import threading
+
+import pytest
+
+import dizzy
+
+from conftest import load_dizz, run_dizzy, walk
+from test_seek import PLAIN, STATEFUL, load_act, run_case
+
+@pytest.mark.parametrize("model", [ "plain", "stateful" ])
+@pytest.mark.parametrize("recurse", [ False, True ])
+def test_snapshot(tmp_path, model, recurse):
+    #after restore() the walk goes on with the same packets
+    source = PLAIN if model == "plain" else STATEFUL % os.devnull
+    packets = walk(load_dizz(tmp_path, model, source), recurse, 300)
+    d = load_dizz(tmp_path, model, source)
+    for k in range(len(packets) - 5):
+        state = d.snapshot()
+        rstate = random.getstate()
+        assert walk(d, recurse, 5) == packets[k:k + 5], k
+        d.restore(state)
+        random.setstate(rstate)
+        d.operate()
+        assert d.generate() == packets[k], k
+        d.mutate(recurse)
+
+def test_act_snapshot(tmp_path):
+    i = load_act(tmp_path)
+    for k in range(50):
+        state = i.snapshot()
+        cases = [ run_case(i, False)[0] for n in range(3) ]
+        i.restore(state)
+        assert [ run_case(i, False)[0] for n in range(3) ] == cases, k
+        i.restore(state)
+        run_case(i, False)
+
+HELLO = '''name = "hello"
+objects = [
+    field("h", 40, b"hello", none),
+]
+functions = []
+'''
+
+TINY = '''name = "tiny"
+objects = [
+    field("x", 8, b"\\x01", none),
+    field("y", 2, b"\\x01", full),
+]
+functions = []
+'''
+
+def test_retry_lost_connection(tmp_path):
+    #the first connection is reset after the first packet, the test case
+    #is sent again on the next connection
+    for (name, source) in (("hello", HELLO), ("tiny", TINY)):
+        with open(str(tmp_path / (name + ".dizz")), "w") as f:
+            f.write(source)
+    filename = str(tmp_path / "steps.act")
+    with open(filename, "w") as f:
+        f.write('name = "steps"\nobjects = [\n    dizz("one", "%s"),\n    dizz("two", "%s"),\n]\nfunctions = []\n' % (tmp_path / "hello.dizz", tmp_path / "tiny.dizz"))
+    i = dizzy.interaction(dizzy.dizz_library())
+    i.load(filename)
+    stream = b""
+    done = False
+    while not done:
+        (out, done) = run_case(i, False)
+        stream += b"".join(out)
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(2)
+    server.settimeout(60)
+    conns = []
+    def accept():
+        (conn, _) = server.accept()
+        conns.append(conn.recv(1 << 16))
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        conn.close()
+        (conn, _) = server.accept()
+        data = b""
+        while True:
+            r = conn.recv(1 << 16)
+            if not r:
+                break
+            data += r
+        conns.append(data)
+        conn.close()
+    thread = threading.Thread(target=accept)
+    thread.start()
+    try:
+        run_dizzy("-o", "tcp", "-d", "127.0.0.1", "-e", "rand:%d" % server.getsockname()[1], "-w", "0", "-W", "0.2", filename)
+    finally:
+        thread.join()
+        server.close()
+    assert conns == [ b"hello", stream ]
@@ -0,0 +1,129 @@
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+import dizzy
+
+from conftest import ROOT, load_dizz, run_dizzy, walk
+from test_seek import LAST, run_case
+
+FIXED = '''name = "fixed"
+objects = [
+    field("a", 8, b"\\x01", std),
+    field("len", 8, b"\\x00", none),
+    field("b", 6, b"\\x01", full),
+    field("csum", 16, b"\\x00\\x00", none),
+    field("c", 10, b"\\x01\\x23", std),
+]
+functions = [
+    length("len", "b", "c"),
+    csum("csum", "a", "c", "inet"),
+]
+'''
+
+def load_act(tmp_path):
+    for (name, source) in (("fixed", FIXED), ("last", LAST)):
+        with open(str(tmp_path / (name + ".dizz")), "w") as f:
+            f.write(source)
+    filename = str(tmp_path / "steps.act")
+    with open(filename, "w") as f:
+        f.write('name = "steps"\nobjects = [\n    dizz("one", "%s"),\n    dizz("two", "%s"),\n]\nfunctions = []\n' % (tmp_path / "fixed.dizz", tmp_path / "last.dizz"))
+    i = dizzy.interaction(dizzy.dizz_library())
+    i.load(filename)
+    return (filename, i)
+
+def split(cases, workers):
+    #the packets of the test cases fork_workers() hands to each worker
+    count = len(cases)
+    return sorted([ sum(cases[count * k // workers:count * (k + 1) // workers], []) for k in range(workers) ])
+
+@pytest.mark.parametrize("workers", [ 2, 3 ])
+@pytest.mark.parametrize("recurse", [ False, True ])
+def test_workers_dizz(tmp_path, sink, workers, recurse):
+    packets = walk(load_dizz(tmp_path, "fixed", FIXED), recurse)
+    args = [ "-R" ] if recurse else []
+    run_dizzy("-j", workers, *sink.args() + args + [ str(tmp_path / "fixed.dizz") ])
+    sink.close()
+    assert sorted(sink.streams()) == split([ [ i ] for i in packets ], workers)
+
+@pytest.mark.parametrize("workers", [ 2, 3 ])
+def test_workers_act(tmp_path, sink, workers):
+    (filename, i) = load_act(tmp_path)
+    cases = []
+    done = False
+    while not done:
+        (out, done) = run_case(i, False)
+        cases += [ out ]
+    run_dizzy("-j", workers, *sink.args() + [ filename ])
+    sink.close()
+    assert sorted(sink.streams()) == split(cases, workers)
+
+def start_dizzy(*args):
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    return subprocess.Popen([ sys.executable, os.path.join(ROOT, "dizzy.py") ] + [ str(i) for i in args ], cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+def test_coordinator(tmp_path, sink):
+    packets = walk(load_dizz(tmp_path, "fixed", FIXED), False)
+    filename = str(tmp_path / "fixed.dizz")
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    address = "127.0.0.1:%d" % listener.getsockname()[1]
+    listener.close()
+    coordinator = start_dizzy("--coordinator", address, "--chunk", 20, filename)
+    try:
+        line = b" "
+        while line and not b"waiting for workers" in line:
+            line = coordinator.stdout.readline()
+        assert line
+        workers = [ start_dizzy("-q", "--worker", address, *sink.args() + [ filename ]) for k in range(2) ]
+        for w in workers:
+            w.communicate(timeout=300)
+            assert w.returncode == 0
+        coordinator.communicate(timeout=300)
+        assert coordinator.returncode == 0
+    finally:
+        coordinator.kill()
+    sink.close()
+    #each range is sent by its own process
+    assert sorted(sink.streams()) == sorted([ packets[k:k + 20] for k in range(0, len(packets), 20) ])
+
+BIG = '''name = "big"
+objects = [
+    field("a", 12, b"\\x00\\x01", full),
+]
+functions = []
+'''
+
+def test_worker_progress(tmp_path, sink):
+    #a worker reports after each block of test cases, not only on the
+    #growing schedule of the main loop
+    load_dizz(tmp_path, "big", BIG)
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    listener.settimeout(60)
+    worker = start_dizzy("-q", "--worker", "127.0.0.1:%d" % listener.getsockname()[1], *sink.args() + [ str(tmp_path / "big.dizz") ])
+    try:
+        (c, _) = listener.accept()
+        f = c.makefile("rb")
+        assert f.readline().split() == [ b"hello", b"0", b"4097" ]
+        c.sendall(b"range 0 3500\n")
+        progress = []
+        while True:
+            cmd = f.readline().split()
+            if cmd[0] != b"progress":
+                break
+            progress += [ int(cmd[1]) ]
+        assert cmd[:2] == [ b"finished", b"3500" ]
+        c.sendall(b"done\n")
+        worker.communicate(timeout=60)
+        assert worker.returncode == 0
+    finally:
+        worker.kill()
+        listener.close()
+    sink.close()
+    assert len(sink.packets) == 3500
+    assert progress == [ 1 ] + list(range(dizzy.WORKER_PROGRESS, 3500, dizzy.WORKER_PROGRESS))
@@ -31,7 +31,19 @@
 #       (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 #       OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import array
+import ast
+import bisect
+import hashlib
+import itertools
+import lzma
+import math
+import mmap
+import os
+import shutil
 import struct
+import tempfile
+import zlib
 
 DEBUG = False
 
@@ -116,3 +128,583 @@ def str_to_bin(s):
             out += "  "
         c += 1
     return out[:-2]
+
+class bitwriter(object):
+    #appends fields of any bit length to a bytearray. offset is the number
+    #of bits still free in the last byte. the value of a field which is not
+    #a multiple of 8 bits long is right aligned in cur and gets moved to the
+    #top bits first.
+    def __init__(self, data=b"", offset=0):
+        self.out = bytearray(data)
+        self.offset = offset
+
+    def write(self, cur, length, bytelen):
+        modulo = length % 8
+        if modulo != 0:
+            mask = (1 << bytelen * 8) - 1
+            cur = ((int.from_bytes(cur[:bytelen], "big") << 8 - modulo) & mask).to_bytes(bytelen, "big")
+        if self.offset == 0:
+            self.out += cur
+            if modulo != 0:
+                self.offset = 8 - modulo
+            return
+        if bytelen > 0:
+            data = (int.from_bytes(cur[:bytelen], "big") << self.offset).to_bytes(bytelen + 1, "big")
+            self.out[-1] |= data[0]
+            if modulo < self.offset:
+                self.out += data[1:]
+            else:
+                self.out += data[1:-1]
+        self.offset = abs(self.offset - modulo)
+
+    def getvalue(self):
+        return bytes(self.out)
+
+class permutation(object):
+    #a pseudo random bijection of range(size) selected by key. the first
+    #values are distinct numbers drawn uniformly from range(size), without
+    #storing the ones drawn before. a feistel network on the smallest even
+    #number of bits covering size, values outside of range(size) are mapped
+    #again until they are inside (cycle walking).
+    def __init__(self, size, key=b"", rounds=4):
+        self.size = size
+        self.half = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.mask = (1 << self.half) - 1
+        self.bytelen = (self.half + 7) // 8
+        self.keys = [ hashlib.sha256(key + struct.pack("!B", i)).digest() for i in range(rounds) ]
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if index < 0 or index >= self.size:
+            raise IndexError("permutation index out of range")
+        x = index
+        while True:
+            left = x >> self.half
+            right = x & self.mask
+            for k in self.keys:
+                f = hashlib.shake_128(k + right.to_bytes(self.bytelen, "big")).digest(self.bytelen)
+                (left, right) = (right, left ^ (int.from_bytes(f, "big") & self.mask))
+            x = (left << self.half) | right
+            if x < self.size:
+                return x
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self[i]
+
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    def popcount(x):
+        return bin(x).count("1")
+
+BITREV = bytes([ int("{:08b}".format(i)[::-1], 2) for i in range(256) ])
+
+class crc(object):
+    #a reflected crc of 'width' bits with the given (reflected) polynom.
+    #the crc of a message is linear in its bits: bit r of the crc is the
+    #parity of the message bits selected by row r of the crc's matrix. so
+    #a message is checked with 'width' ands and popcounts of big ints, not
+    #with a python loop over its bytes. row r holds in bit d bit r of the
+    #crc of a single set bit d bits before the end of the message, the
+    #rows grow with the longest message seen. short messages are done
+    #with the byte table, which is faster for them.
+    SHORT = 48
+
+    def __init__(self, width, poly):
+        self.width = width
+        self.poly = poly
+        self.table = []
+        for i in range(256):
+            c = i
+            for j in range(8):
+                if c & 1:
+                    c = (c >> 1) ^ poly
+                else:
+                    c >>= 1
+            self.table += [ c ]
+        self.size = 0
+        self.rows = []
+
+    def _grow(self, size):
+        #a set bit one bit further away goes through the register once
+        #more, this gives row 0. row r is row r + 1 shifted in by one,
+        #xor'ed with row 0 if the polynom has bit r set.
+        size = max(size, self.size * 2, 1024)
+        bits = bytearray()
+        s = self.poly
+        for d in range(size * 8):
+            bits.append(0x30 | (s & 1))
+            if s & 1:
+                s = (s >> 1) ^ self.poly
+            else:
+                s >>= 1
+        bits.reverse()
+        mask = (1 << (size * 8)) - 1
+        row0 = int(bits, 2)
+        rows = [ row0 ]
+        row = 0
+        for r in range(self.width - 1, 0, -1):
+            if (self.poly >> r) & 1:
+                row = (((row ^ row0) << 1) | 1) & mask
+            else:
+                row = (row << 1) & mask
+            rows.insert(1, row)
+        self.rows = rows
+        self.size = size
+
+    def __call__(self, data, crc=0):
+        #the register after the message, starting with crc
+        if len(data) < self.SHORT:
+            table = self.table
+            for b in data:
+                crc = table[(crc ^ b) & 0xFF] ^ (crc >> 8)
+            return crc
+        if len(data) > self.size:
+            self._grow(len(data))
+        x = int.from_bytes(bytes(data).translate(BITREV), "big")
+        if crc:
+            #the start value is xor'ed into the first bytes
+            x ^= int.from_bytes(crc.to_bytes(self.width // 8, "little").translate(BITREV), "big") << (len(data) * 8 - self.width)
+        out = 0
+        for r in range(self.width):
+            out |= (popcount(self.rows[r] & x) & 1) << r
+        return out
+
+def covering_array(sizes, t=2):
+    #rows of values (0 to size - 1) for parameters with the given number of
+    #values, such that all combinations of the values of any t parameters
+    #are in one of the rows. greedy in parameter order (IPOG): the rows are
+    #grown by the value of the next parameter covering the most new
+    #combinations, the combinations left get rows of their own. unused
+    #values are 0.
+    order = sorted(range(len(sizes)), key=lambda k: -sizes[k])
+    vals = [ sizes[k] for k in order ]
+    t = max(1, min(t, len(vals)))
+    rows = [ list(r) for r in itertools.product(*[ range(v) for v in vals[:t] ]) ]
+    #the combinations of the values of t - 1 parameters are numbered, those
+    #of combination c start at offsets[k]. the combinations of parameters
+    #before i - 1 come first, so the numbers stay the same while the rows
+    #grow. masks holds the bits of the combinations in each row without
+    #unset values.
+    combos = [ tuple(range(t - 1)) ]
+    offsets = []
+    total = 0
+    masks = {}
+
+    def covers(r, first=0):
+        mask = 0
+        for k in range(first, len(combos)):
+            pos = 0
+            for j in combos[k]:
+                if r[j] is None:
+                    break
+                pos = pos * vals[j] + r[j]
+            else:
+                mask |= 1 << (offsets[k] + pos)
+        return mask
+    for i in range(t, len(vals)):
+        first = len(offsets)
+        if t > 1:
+            for c in itertools.combinations(range(i - 1), t - 2):
+                combos += [ c + (i - 1,) ]
+        for c in combos[len(offsets):]:
+            offsets += [ total ]
+            n = 1
+            for j in c:
+                n *= vals[j]
+            total += n
+        #uncovered[b] has the bits of the combinations not yet in a row
+        #with value b of parameter i
+        uncovered = [ (1 << total) - 1 ] * vals[i]
+        #horizontal growth
+        for (n, r) in enumerate(rows):
+            if n in masks:
+                mask = masks[n] = masks[n] | covers(r, first)
+            else:
+                mask = covers(r)
+            gains = [ popcount(u & mask) for u in uncovered ]
+            gain = max(gains)
+            if gain > 0:
+                best = gains.index(gain)
+                uncovered[best] &= ~mask
+                r.append(best)
+            else:
+                r.append(None)
+        #vertical growth, only rows with unset values can take more
+        left = []
+        for b in range(vals[i]):
+            bits = uncovered[b]
+            while bits:
+                low = bits & -bits
+                left += [ (low.bit_length() - 1, b) ]
+                bits ^= low
+        left.sort()
+        open_rows = [ r for r in rows if None in r ]
+        for (pos, b) in left:
+            if not uncovered[b] >> pos & 1:
+                continue
+            k = bisect.bisect_right(offsets, pos) - 1
+            c = combos[k]
+            v = []
+            rest = pos - offsets[k]
+            for j in reversed(c):
+                v.insert(0, rest % vals[j])
+                rest //= vals[j]
+            for r in open_rows:
+                if (r[i] is None or r[i] == b) and all([ r[j] is None or r[j] == v[n] for (n, j) in enumerate(c) ]):
+                    break
+            else:
+                r = [ None ] * (i + 1)
+                rows.append(r)
+                open_rows.append(r)
+            r[i] = b
+            for (n, j) in enumerate(c):
+                r[j] = v[n]
+            uncovered[b] &= ~covers(r)
+        for (n, r) in enumerate(rows):
+            if not n in masks and not None in r:
+                masks[n] = covers(r)
+    out = []
+    for r in rows:
+        row = [ 0 ] * len(sizes)
+        for (k, j) in enumerate(order):
+            if not r[k] is None:
+                row[j] = r[k]
+        out.append(row)
+    return out
+
+class bloomfilter(object):
+    #a set of byte strings in 'size' bytes of memory. it may claim to hold
+    #a string which was not added (see error()), but never the other way
+    #round. the number of hashes is chosen for 'capacity' strings.
+    def __init__(self, size, capacity):
+        self.bits = bytearray(max(1, size))
+        self.size = len(self.bits) * 8
+        self.hashes = min(16, max(1, int(round(self.size / max(1, capacity) * math.log(2)))))
+        self.count = 0
+        self.duplicates = 0
+
+    def add(self, data):
+        #returns True if data was (probably) added before
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        seen = True
+        bits = self.bits
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % self.size
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                seen = False
+        if seen:
+            self.duplicates += 1
+        else:
+            self.count += 1
+        return seen
+
+    def error(self, count=None):
+        #chance of a false positive after count strings were added
+        if count is None:
+            count = self.count
+        return (1 - math.exp(-self.hashes * count / self.size)) ** self.hashes
+
+#corpus files: a header, the packets (compressed in blocks of the same
+#uncompressed size, if at all), the table of blocks (offset, length), the
+#index of the records (offset in the packets, test case number, length,
+#field or -1) and a python literal with information on the model.
+CORPUS_MAGIC = b"DIZZCORP"
+CORPUS_VERSION = 1
+CORPUS_HEADER = struct.Struct("<8sHBxIQQQQQQ")
+CORPUS_BLOCK = struct.Struct("<QQ")
+CORPUS_RECORD = struct.Struct("<QQIi")
+CORPUS_COMPRESSION = [ None, "zlib", "lzma" ]
+
+class corpuswriter(object):
+    #writes a corpus file. the index and the table of blocks go to
+    #temporary files first, so memory use does not grow with the corpus.
+    def __init__(self, filename, compression=None, blocksize=1 << 20, meta=None):
+        self.filename = filename
+        self.compression = compression
+        self.blocksize = blocksize if compression else 0
+        assert not compression or blocksize > 0, "blocksize must be positive"
+        self.meta = meta or {}
+        self.f = open(filename, "wb")
+        self.f.write(bytes(CORPUS_HEADER.size))
+        self.index = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(filename)))
+        self.blocks = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(filename)))
+        self.block = bytearray()
+        self.count = 0
+        self.size = 0
+
+    def write(self, data, num, field=-1):
+        self.index.write(CORPUS_RECORD.pack(self.size, num, len(data), field))
+        self.count += 1
+        self.size += len(data)
+        if not self.compression:
+            self.f.write(data)
+            return
+        self.block += data
+        while len(self.block) >= self.blocksize:
+            self._flush_block(self.block[:self.blocksize])
+            del self.block[:self.blocksize]
+
+    def _flush_block(self, data):
+        if self.compression == "zlib":
+            data = zlib.compress(data)
+        else:
+            data = lzma.compress(data)
+        self.blocks.write(CORPUS_BLOCK.pack(self.f.tell(), len(data)))
+        self.f.write(data)
+
+    def _append(self, tmp):
+        offset = self.f.tell()
+        tmp.seek(0)
+        shutil.copyfileobj(tmp, self.f)
+        tmp.close()
+        return offset
+
+    def close(self):
+        if self.block:
+            self._flush_block(self.block)
+            self.block = bytearray()
+        blocks = self._append(self.blocks)
+        index = self._append(self.index)
+        meta = self.f.tell()
+        self.f.write(repr(self.meta).encode("utf-8"))
+        end = self.f.tell()
+        self.f.seek(0)
+        self.f.write(CORPUS_HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, CORPUS_COMPRESSION.index(self.compression), self.blocksize, self.count, self.size, blocks, index, meta, end - meta))
+        self.f.close()
+
+class corpusreader(object):
+    #reads a corpus file written by corpuswriter. the packets are
+    #memoryviews of the mmap'ed file, compressed blocks are decompressed
+    #when a packet in them is read.
+    def __init__(self, filename):
+        self.filename = filename
+        self.f = open(filename, "rb")
+        self.map = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        (magic, version, compression, self.blocksize, self.count, self.size, self.blocks, self.index, self.meta, metalen) = CORPUS_HEADER.unpack_from(self.map, 0)
+        if magic != CORPUS_MAGIC or version != CORPUS_VERSION:
+            raise ValueError("%s is no corpus file" % filename)
+        self.compression = CORPUS_COMPRESSION[compression]
+        self.metalen = metalen
+        self.cached = None
+        self.block = None
+
+    def __len__(self):
+        return self.count
+
+    def get_meta(self):
+        return ast.literal_eval(bytes(self.view[self.meta:self.meta + self.metalen]).decode("utf-8"))
+
+    def _get_block(self, k):
+        if self.cached != k:
+            (offset, length) = CORPUS_BLOCK.unpack_from(self.map, self.blocks + k * CORPUS_BLOCK.size)
+            if self.compression == "zlib":
+                self.block = memoryview(zlib.decompress(self.view[offset:offset + length]))
+            else:
+                self.block = memoryview(lzma.decompress(self.view[offset:offset + length]))
+            self.cached = k
+        return self.block
+
+    def _get_data(self, offset, length):
+        if not self.compression:
+            offset += CORPUS_HEADER.size
+            return self.view[offset:offset + length]
+        (k, pos) = divmod(offset, self.blocksize)
+        if pos + length <= self.blocksize:
+            return self._get_block(k)[pos:pos + length]
+        data = bytearray()
+        while len(data) < length:
+            data += self._get_block(k)[pos:pos + length - len(data)]
+            k += 1
+            pos = 0
+        return memoryview(bytes(data))
+
+    def __getitem__(self, index):
+        #(test case number, field or -1, packet)
+        if index < 0 or index >= self.count:
+            raise IndexError("corpus index out of range")
+        (offset, num, length, field) = CORPUS_RECORD.unpack_from(self.map, self.index + index * CORPUS_RECORD.size)
+        return (num, field, self._get_data(offset, length))
+
+    def records(self, first=0, stop=None):
+        #yields (test case number, field or -1, packet) of the records
+        #first to stop - 1
+        if stop is None or stop > self.count:
+            stop = self.count
+        if first >= stop:
+            return
+        index = self.view[self.index + first * CORPUS_RECORD.size:self.index + stop * CORPUS_RECORD.size]
+        for (offset, num, length, field) in CORPUS_RECORD.iter_unpack(index):
+            yield (num, field, self._get_data(offset, length))
+
+#index files of list libraries: a header, the offsets and the lengths of
+#the unique lines, then the hashes of the lines in sorted order and the
+#numbers of these lines
+LIST_MAGIC = b"DIZZLIST"
+LIST_HEADER = struct.Struct("<8sQQQ?7x")
+
+def line_hash(line):
+    #a hash of a line which is the same in all processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(line, digest_size=8).digest(), "little")
+
+class listfile(object):
+    #the unique lines of a text file like dizz_library.load_strings() reads
+    #them, with "" in front and None at the end. lines are read from the
+    #mmap'ed file when used. their offsets and lengths, and their hashes to
+    #look them up by value, are kept in FILENAME.index (FILENAME.raw.index
+    #if not ascii), so processes using the same list share the pages of
+    #both files.
+    def __init__(self, filename, ascii=True):
+        self.filename = filename
+        self.ascii = ascii
+        self.f = open(filename, "rb")
+        st = os.fstat(self.f.fileno())
+        self.map = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else b""
+        key = (st.st_mtime_ns, st.st_size, ascii)
+        index = filename + (".index" if ascii else ".raw.index")
+        if not self._load_index(index, key):
+            self._build_index()
+            self._save_index(index, key)
+
+    def _load_index(self, index, key):
+        try:
+            with open(index, "rb") as f:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            (magic, mtime, size, count, ascii) = LIST_HEADER.unpack_from(m, 0)
+            if magic != LIST_MAGIC or (mtime, size, ascii) != key or len(m) != LIST_HEADER.size + count * 24:
+                m.close()
+                return False
+        except Exception:
+            return False
+        view = memoryview(m)
+        start = LIST_HEADER.size
+        self.offsets = view[start:start + count * 8].cast("Q")
+        self.lengths = view[start + count * 8:start + count * 12].cast("I")
+        self.hashes = view[start + count * 12:start + count * 20].cast("Q")
+        self.numbers = view[start + count * 20:start + count * 24].cast("I")
+        self.count = count
+        return True
+
+    def _build_index(self):
+        self.offsets = array.array("Q")
+        self.lengths = array.array("I")
+        hashes = []
+        #lines are told apart by their hash while building the index, lines
+        #with the same hash are compared. 'more' holds the lines of a hash
+        #after the first one.
+        seen = {}
+        more = {}
+        pos = 0
+        end = len(self.map)
+        while pos < end:
+            nl = self.map.find(b"\n", pos)
+            if nl < 0:
+                nl = end
+            length = nl - pos
+            if length > 0 and self.map[nl - 1:nl] == b"\r":
+                length -= 1
+            line = self._get_line(pos, length)
+            if line:
+                h = line_hash(line)
+                if not h in seen:
+                    seen[h] = len(self.offsets)
+                    self.offsets.append(pos)
+                    self.lengths.append(length)
+                    hashes.append(h)
+                else:
+                    same = [ seen[h] ] + more.get(h, [])
+                    if not line in [ self._get_line(self.offsets[k], self.lengths[k]) for k in same ]:
+                        more.setdefault(h, []).append(len(self.offsets))
+                        self.offsets.append(pos)
+                        self.lengths.append(length)
+                        hashes.append(h)
+            pos = nl + 1
+        self.count = len(self.offsets)
+        order = sorted(range(self.count), key=hashes.__getitem__)
+        self.hashes = array.array("Q", [ hashes[k] for k in order ])
+        self.numbers = array.array("I", order)
+
+    def _save_index(self, index, key):
+        try:
+            tmp = "%s.%d" % (index, os.getpid())
+            with open(tmp, "wb") as f:
+                f.write(LIST_HEADER.pack(LIST_MAGIC, key[0], key[1], self.count, key[2]))
+                f.write(self.offsets.tobytes())
+                f.write(self.lengths.tobytes())
+                f.write(self.hashes.tobytes())
+                f.write(self.numbers.tobytes())
+            os.replace(tmp, index)
+        except Exception:
+            pass
+
+    def _get_line(self, offset, length):
+        line = self.map[offset:offset + length]
+        if not self.ascii:
+            line = line.decode("unicode_escape").encode("utf-8")
+        return line
+
+    def __len__(self):
+        return self.count + 2
+
+    def __getitem__(self, index):
+        if index == 0:
+            return "" if self.ascii else b""
+        if index == self.count + 1:
+            return None
+        line = self._get_line(self.offsets[index - 1], self.lengths[index - 1])
+        if self.ascii:
+            return line.decode("utf-8")
+        return line
+
+    def find(self, line):
+        #the index of line, as bytes like _get_line() returns it, or None
+        if not line:
+            return 0
+        h = line_hash(line)
+        k = bisect.bisect_left(self.hashes, h)
+        while k < self.count and self.hashes[k] == h:
+            n = self.numbers[k]
+            if self._get_line(self.offsets[n], self.lengths[n]) == line:
+                return n + 1
+            k += 1
+        return None
+
+    def entries(self, encoding):
+        return listentries(self, encoding)
+
+class listentries(object):
+    #the lines of a listfile encoded for a field, see
+    #dizz_library._get_entries(). the walk through a list keeps its
+    #position in the field, get() is only needed for values set from
+    #elsewhere and looks them up in the index of the listfile.
+    def __init__(self, lines, encoding):
+        self.lines = lines
+        self.encoding = encoding
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getitem__(self, index):
+        line = self.lines[index]
+        if isinstance(line, str):
+            line = line.encode(self.encoding)
+        return line
+
+    def get(self, value, default=None):
+        if self.lines.ascii:
+            try:
+                value = value.decode(self.encoding).encode("utf-8")
+            except UnicodeError:
+                return default
+        index = self.lines.find(value)
+        if index is None:
+            return default
+        return index